@@ -1,12 +1,17 @@
 import math
+import multiprocessing
 import sys
 import pente
 import copy
 import ConsecutivePieces
+import time
 import timeit
 import CapturedPieces
+import Candidates
 import MidControl
 import Momentum
+import TranspositionTable
+import Zobrist
 
 sys.setrecursionlimit(15000)
 pinfi = sys.maxsize
@@ -24,6 +29,22 @@ ninfi = -sys.maxsize
 # 10 -- mid_control_streaks + mid_control_pieces
 numberOfHeuristic = 5
 bigDepth = 4
+# Seconds per move for an iterative deepening search. None searches every move to bigDepth instead
+timeLimit = None
+# Only empty positions within this many rows and columns of a stone are searched. None searches every empty position
+candidateRadius = 2
+# Whether minmax sorts the moves (see orderMoves) before searching them
+moveOrdering = True
+# Whether minmax searches every move after the first with a null window first (principal variation search). Only
+# searches with a transposition table do, without one the re-searches cost more than the null windows save. Even with
+# one it does not pay off yet: on the Benchmark positions it searches 0.1% more nodes than plain alpha beta at depth 3
+# (77115 against 77028, 4 of 8 positions worse) and 0.8% more at depth 4, so it is off
+principalVariation = False
+# Half the width of the window iterative deepening starts each iteration with, around the previous score, for each
+# heuristic. The scores of the heuristics are of very different sizes. Each window is about the 75th percentile of how
+# much the root score changed from one depth to the next (depths 1 to 3) on the Benchmark positions, so most iterations
+# fall inside it. None always starts with a full window
+aspirationWindows = {1: 25, 2: 2, 3: 2, 4: 30, 5: 10, 6: 25, 7: 10, 8: 25, 9: 10, 10: 30}
 Combinations = {
     1: {1: 1, 2: 1, 3: "player 1 -- ConsecutivePieces, player 2 -- ConsecutivePieces"},
     2: {1: 1, 2: 2, 3: "player 1 -- ConsecutivePieces, player 2 -- CapturedPieces"},
@@ -57,33 +78,44 @@ class Board:
 
     :param board: a Pente game board
     :param status: the status of win, 1 for player 1 wins and 2 for player 2 wins
-    :param moves: a list of all previous moves [ [row, col] ... ]
     """
     board = []
     status = 0
     captures = [0, 0]
-    moves = []
+    # Candidates kept up to date by makeMove and unmakeMove, or None
+    candidates = None
 
     # initialize the board
     def __init__(self, size, board=None):
-        self.board = pente.make_board(size)
         if board != None:
-            for i in range(len(board.board)):
-                for j in range(len(board.board[0])):
-                    self.board[i][j] = board.board[i][j]
+            self.board = board.board.copy()
+        else:
+            self.board = pente.FlatBoard(size)
+        self.captures = [0, 0]
+        self.undo = []
 
     def getEmptyPositions(self):
         """
         Get all empty positons on the board
         :return: all empty positions with cols and rows
         """
+        size = self.board.size
         emptyPosition = []
-        for i in range(len(self.board)):
-            for j in range(len(self.board[i])):
-                if self.board[i][j] == 0:
-                    emptyPosition.append([i, j])
+        for index, cell in enumerate(self.board.cells):
+            if cell == 0:
+                emptyPosition.append([index // size, index % size])
         return emptyPosition
 
+    def getCandidatePositions(self):
+        """
+        Get the positions worth searching. These are the empty positions near a stone when candidates are kept, and
+        all empty positions otherwise
+        :return: the positions with cols and rows
+        """
+        if self.candidates is None:
+            return self.getEmptyPositions()
+        return self.candidates.positions()
+
     def performMove(self, p, player):
         """
         Call the pente game to perform a move
@@ -97,10 +129,113 @@ class Board:
         self.status = win
         self.captures = captures
 
+    def makeMove(self, p, player):
+        """
+        Perform a move in place and remember how to take it back with unmakeMove
+        :param p: the position of move that we want to perform
+        :param player: the player that perform the move, either 1 or 2
+        """
+        record = pente.make_move(self.board, self.captures, player, p[0], p[1], self.status)
+        self.undo.append(record)
+        self.status = record.win
+        if self.candidates is not None:
+            self.candidates.apply(record)
+
+    def unmakeMove(self):
+        """
+        Take back the last move made by makeMove
+        """
+        record = self.undo.pop()
+        self.status = pente.unmake_move(self.board, self.captures, record)
+        if self.candidates is not None:
+            self.candidates.undo(record)
+
     def printBoard(self):
         pente.print_board(self.board)
 
 
+class SearchTimeout(Exception):
+    """
+    Raised inside minmax when the search runs out of time
+    """
+    pass
+
+
+class Search:
+    """
+    Holds what the nodes of one alpha beta search share
+
+    :param table: an optional TranspositionTable
+    :param maxDepth: the depth to search to, bigDepth if not given
+    :param deadline: an optional time.time() value, the search raises SearchTimeout once it is passed
+    :param sharedAlpha: an optional multiprocessing.Value holding an alpha bound of the root that other processes
+    raise. Every node reads it, so the bound the others found also cuts off this search while it runs
+    """
+
+    def __init__(self, table=None, maxDepth=None, deadline=None, sharedAlpha=None):
+        self.table = table
+        self.maxDepth = bigDepth if maxDepth is None else maxDepth
+        self.deadline = deadline
+        self.sharedAlpha = sharedAlpha
+        # The highest value read from sharedAlpha. It only goes up
+        self.floor = ninfi
+        # The best root move of the previous iteration, searched first. -1 if there is none
+        self.rootMove = -1
+        # killers[depth] holds the last two moves that caused a cutoff at that depth
+        self.killers = []
+        # history[player][index] adds up how often (weighted by depth) a move caused a cutoff. Made by minmax
+        self.history = None
+        # The number of nodes visited, cutoffs, and cutoffs caused by the first move searched
+        self.nodes = 0
+        self.cutoffs = 0
+        self.firstCutoffs = 0
+        # The number of null window searches that had to be searched again with the full window
+        self.researches = 0
+        # The triangular principal variation table. pv[depth][depth:pvLength[depth]] is the best line found from the
+        # node at that depth, as flat indexes. Made by minmax, and made again when the search gets deeper
+        self.pv = []
+        self.pvLength = []
+
+    def cutoff(self, depth, turn, index, first, remaining):
+        """
+        Remember a move that caused a beta (or alpha) cutoff
+        :param depth: the depth of the node
+        :param turn: the player who made the move
+        :param index: the flat index of the move
+        :param first: whether it was the first move searched at the node
+        :param remaining: how many plies were left to search below the node
+        """
+        self.cutoffs += 1
+        if first:
+            self.firstCutoffs += 1
+        killers = self.killers[depth]
+        if killers[0] != index:
+            killers[1] = killers[0]
+            killers[0] = index
+        self.history[turn][index] += remaining * remaining
+
+    def stats(self):
+        """
+        :return: a dictionary with the node and cutoff counters, and how often the first move caused the cutoff
+        """
+        return {
+            'nodes': self.nodes,
+            'cutoffs': self.cutoffs,
+            'firstMoveCutoffs': self.firstCutoffs,
+            'firstMoveCutoffRate': self.firstCutoffs / self.cutoffs if self.cutoffs > 0 else 0.0,
+            'researches': self.researches,
+        }
+
+    def principalVariation(self, size):
+        """
+        :param size: the board size
+        :return: the best line found by the last search from the root, a list of [row, col]
+        """
+        if len(self.pvLength) == 0:
+            return []
+        return [[index // size, index % size] for index in self.pv[0][:self.pvLength[0]]]
+
+
 # 1 -- ConsecutivePieces
 # 2 -- CapturedPieces
 # 3 -- mid_control_pieces
@@ -111,53 +246,103 @@ class Board:
 # 8 -- ConsecutivePieces + mid_control_pieces
 # 9 -- Momentum + mid_control_pieces
 # 10 -- mid_control_streaks + mid_control_pieces
-def getHeu(board, player, capturess):
+def getHeu(board, player, capturess, heuristic=None):
     """
     Helper method for selecting heuristic.
 
     :param board: a board object
     :param player: either 1 or 2, the current player
     :param capturess: a list of how many stones are captured
+    :param heuristic: the number of the heuristic, numberOfHeuristic if not given
 
     :return: current board, board with heuristic values, and a score that is calculated based on the heuristic
     """
 
-    global numberOfHeuristic
-    if numberOfHeuristic == 1:  # 1 -- ConsecutivePieces
+    if heuristic is None:
+        heuristic = numberOfHeuristic
+    if heuristic == 1:  # 1 -- ConsecutivePieces
         return ConsecutivePieces.calculate_streaks(board, player)
-    elif numberOfHeuristic == 2:  # 2 -- CapturedPieces
+    elif heuristic == 2:  # 2 -- CapturedPieces
         return CapturedPieces.captured_pieces(board, capturess, player)
-    elif numberOfHeuristic == 3:  # 3 -- mid_control_pieces
+    elif heuristic == 3:  # 3 -- mid_control_pieces
         return MidControl.mid_control_pieces(board, player)
-    elif numberOfHeuristic == 4:  # 4 -- mid_control_streaks
+    elif heuristic == 4:  # 4 -- mid_control_streaks
         return MidControl.mid_control_streaks(board, player)
-    elif numberOfHeuristic == 5:  # 5 -- Momentum
+    elif heuristic == 5:  # 5 -- Momentum
         tboard, score = Momentum.momentum_heuristic(board, player)
         heuristics = tboard
         return tboard, heuristics, score
-    elif numberOfHeuristic == 6:  # 6 -- ConsecutivePieces + CapturedPieces
+    elif heuristic == 6:  # 6 -- ConsecutivePieces + CapturedPieces
         tboard, heuristics, score = ConsecutivePieces.calculate_streaks(board, player)
         tboard, heuristics, score1 = CapturedPieces.captured_pieces(board, capturess, player)
         return tboard, heuristics, score1 + score
-    elif numberOfHeuristic == 7:  # 7 -- Momentum + CapturedPieces
+    elif heuristic == 7:  # 7 -- Momentum + CapturedPieces
         tboard, score = Momentum.momentum_heuristic(board, player)
         tboard, heuristics, score1 = CapturedPieces.captured_pieces(board, capturess, player)
         return tboard, heuristics, score1 + score
-    elif numberOfHeuristic == 8:  # 8 -- ConsecutivePieces + mid_control_pieces
+    elif heuristic == 8:  # 8 -- ConsecutivePieces + mid_control_pieces
         tboard, heuristics, score = ConsecutivePieces.calculate_streaks(board, player)
         tboard, heuristics, score1 = MidControl.mid_control_pieces(board, player)
         return tboard, heuristics, score1 + score
-    elif numberOfHeuristic == 9:  # 9 -- Momentum + mid_control_pieces
+    elif heuristic == 9:  # 9 -- Momentum + mid_control_pieces
         tboard, score = Momentum.momentum_heuristic(board, player)
         tboard, heuristics, score1 = MidControl.mid_control_pieces(board, player)
         return tboard, heuristics, score1 + score
-    elif numberOfHeuristic == 10:  # 10 -- mid_control_streaks + mid_control_pieces
+    elif heuristic == 10:  # 10 -- mid_control_streaks + mid_control_pieces
         tboard, heuristics, score = MidControl.mid_control_streaks(board, player)
         tboard, heuristics, score1 = MidControl.mid_control_pieces(board, player)
         return tboard, heuristics, score1 + score
 
 
-def minmax(depth, board, maximizingPlayer, player, alpha, beta, size):
+def orderMoves(board, childArray, turn, depth, search, hashMove, size):
+    """
+    Sort the moves so the ones most likely to cause a cutoff are searched first. The order is the hash move, moves
+    that win, moves that capture, moves that block an opponent four, moves that block an opponent three, the killer
+    moves of this depth, and then the rest. Moves in the same group are sorted by their history score, and then in
+    row-major order.
+
+    :param board: a board object
+    :param childArray: the moves to sort, as [row, col]
+    :param turn: either 1 or 2, the player making the moves
+    :param depth: the current depth of the search
+    :param search: the Search
+    :param hashMove: the flat index of the best move from the transposition table (or previous iteration), or -1
+    :param size: the board size
+
+    :return: the sorted moves
+    """
+    flat = board.board
+    opp = 3 - turn
+    killers = search.killers[depth]
+    history = search.history[turn]
+    captured = board.captures[turn - 1]
+    keyed = []
+    for a in childArray:
+        index = a[0] * size + a[1]
+        if index == hashMove:
+            group = 6
+        else:
+            captures = pente.count_captures(flat, turn, index)
+            if captured + 2 * captures >= 10 or pente.line_length(flat, turn, index) >= 4:
+                group = 5
+            elif captures > 0:
+                group = 4
+            else:
+                blocked = pente.line_length(flat, opp, index)
+                if blocked >= 4:
+                    group = 3
+                elif blocked == 3:
+                    group = 2
+                elif index in killers:
+                    group = 1
+                else:
+                    group = 0
+        keyed.append((-group, -history[index], index, a))
+    keyed.sort()
+    return [k[3] for k in keyed]
+
+
+def minmax(depth, board, maximizingPlayer, player, alpha, beta, size, search=None):
     """
     The implementation of the alpha beta pruning.
 
@@ -167,15 +352,62 @@ def minmax(depth, board, maximizingPlayer, player, alpha, beta, size):
     :param player: either 1 or 2, the current player for the algorithm.
     :param alpha: alpha variable for alpha beta pruning
     :param beta: beta variable for alpha beta pruning
+    :param search: an optional Search holding the depth, time limit and transposition table of the search. The
+    transposition table scores are from player's point of view with the current heuristic, so a table should only be
+    shared by searches of the same player with the same heuristic
 
-    :return: heuristic score, board object
+    :return: heuristic score, the flat index of the best move (-1 if the node was not searched further), and the best
+    line from the node as a list of [row, col]. The line is only made at the root (depth 0) and is None below it, so the
+    inner nodes do not allocate; they keep their lines in the table of the search instead
     """
-    global bigDepth
+    if search is None:
+        search = Search()
+    search.nodes += 1
+    if search.deadline is not None and search.nodes % 256 == 0 and time.time() >= search.deadline:
+        raise SearchTimeout()
+    maxDepth = search.maxDepth
+    table = search.table
+    if len(search.pvLength) <= maxDepth:
+        search.pv = [[-1] * (maxDepth + 1) for k in range(maxDepth + 1)]
+        search.pvLength = [0] * (maxDepth + 1)
+    # The line from this node is empty until a move is found
+    search.pvLength[depth] = depth
+    turn = player if maximizingPlayer else 3 - player
+    pvs = principalVariation and table is not None
+    if search.sharedAlpha is not None:
+        search.floor = max(search.floor, search.sharedAlpha.value)
+    # The alpha of the root is a bound for every node below it. A node whose beta is not above it is left alone, its
+    # window would be empty
+    if alpha < search.floor < beta:
+        alpha = search.floor
+    alphaOrig = alpha
+    betaOrig = beta
+    hashMove = -1
+    if depth == 0:
+        hashMove = search.rootMove
+        if candidateRadius is not None:
+            board.candidates = Candidates.Candidates(board.board, candidateRadius)
+    if table is not None:
+        key = Zobrist.position_key(board.board, board.captures, turn)
+        entry = table.probe(key)
+        if entry is not None:
+            entryDepth, entryScore, flag, entryMove = entry
+            if hashMove < 0:
+                hashMove = entryMove
+            # The root always searches, since its caller needs the best move and line
+            if depth > 0 and entryDepth >= maxDepth - depth:
+                if flag == TranspositionTable.EXACT or \
+                        (flag == TranspositionTable.LOWER and entryScore >= beta) or \
+                        (flag == TranspositionTable.UPPER and entryScore <= alpha):
+                    return entryScore, entryMove, _line(search, depth, size)
+
     # Terminate conditions
-    if depth == bigDepth:  # The depth of alpha beta
+    if depth == maxDepth:  # The depth of alpha beta
         tboard, heuristics, score = getHeu(board.board, player, board.captures)
         # print(score)
-        return score, board
+        if table is not None:
+            table.store(key, 0, score, TranspositionTable.EXACT)
+        return score, -1, _line(search, depth, size)
 
     # someone wins end and return
     if board.status != 0:
@@ -185,67 +417,371 @@ def minmax(depth, board, maximizingPlayer, player, alpha, beta, size):
         else:
             # opponent wins
             score = ninfi
-        return score, board
+        return score, -1, _line(search, depth, size)
 
-    childArray = board.getEmptyPositions()
+    childArray = board.getCandidatePositions()
     if len(childArray) == 0:
         tboard, heuristics, score = getHeu(board.board, player, board.captures)
-        return score, board
-
+        return score, -1, _line(search, depth, size)
+
+    while len(search.killers) <= depth:
+        search.killers.append([-1, -1])
+    if search.history is None:
+        search.history = [None, [0] * (size * size), [0] * (size * size)]
+    if moveOrdering:
+        childArray = orderMoves(board, childArray, turn, depth, search, hashMove, size)
+    elif hashMove >= 0:
+        # Search the best move stored for this position first
+        move = [hashMove // size, hashMove % size]
+        if move in childArray:
+            childArray.remove(move)
+            childArray.insert(0, move)
+
+    # The children are searched by making the move on the board and taking it back afterwards
+    bestMove = -1
     # Max
     if maximizingPlayer:
         best = ninfi
-        for a in childArray:
-            temp = Board(size, board)
-            temp.captures = copy.deepcopy(board.captures)
-            temp.performMove(a, player)
-            temp.moves = copy.deepcopy(board.moves)
-            temp.moves.append({'player': player, 'move': a})
-            val, board2 = minmax(depth + 1, temp, False, player, alpha, beta, size)
-            if val > best:
+        for i, a in enumerate(childArray):
+            board.makeMove(a, player)
+            if i == 0 or not pvs:
+                val = minmax(depth + 1, board, False, player, alpha, beta, size, search)[0]
+            else:
+                # A null window only tells if the move is better than the best so far. Only then is it searched again
+                # with the full window to get its score
+                nullBeta = min(beta, alpha + 1)
+                val = minmax(depth + 1, board, False, player, alpha, nullBeta, size, search)[0]
+                if nullBeta <= val < beta:
+                    search.researches += 1
+                    val = minmax(depth + 1, board, False, player, alpha, beta, size, search)[0]
+            board.unmakeMove()
+            # The first move is kept even if it loses, so there is always a best move
+            if val > best or bestMove < 0:
                 best = val
-                result = board2
+                bestMove = a[0] * size + a[1]
+                _updateLine(search, depth, bestMove)
                 alpha = max(alpha, best)
             # Alpha Beta Pruning
             if beta <= alpha:
+                search.cutoff(depth, turn, a[0] * size + a[1], i == 0, maxDepth - depth)
                 break
-        return best, result
     # Min
     else:
         best = pinfi
-        childArray = board.getEmptyPositions()
-        for a in childArray:
-            temp = Board(size, board)
-            temp.captures = copy.deepcopy(board.captures)
-            temp.performMove(a, 3 - player)
-            temp.moves = copy.deepcopy(board.moves)
-            temp.moves.append({'player': 3 - player, 'move': a})
-            val, board2 = minmax(depth + 1, temp, True, player, alpha, beta, size)
-            if val < best:
+        for i, a in enumerate(childArray):
+            board.makeMove(a, 3 - player)
+            if i == 0 or not pvs:
+                val = minmax(depth + 1, board, True, player, alpha, beta, size, search)[0]
+            else:
+                nullAlpha = max(alpha, beta - 1)
+                val = minmax(depth + 1, board, True, player, nullAlpha, beta, size, search)[0]
+                if alpha < val <= nullAlpha:
+                    search.researches += 1
+                    val = minmax(depth + 1, board, True, player, alpha, beta, size, search)[0]
+            board.unmakeMove()
+            if val < best or bestMove < 0:
                 best = val
-                result = board2
+                bestMove = a[0] * size + a[1]
+                _updateLine(search, depth, bestMove)
                 beta = min(beta, best)
             # Alpha Beta Pruning
             if beta <= alpha:
+                search.cutoff(depth, turn, a[0] * size + a[1], i == 0, maxDepth - depth)
                 break
-        return best, result
+
+    if table is not None:
+        # A child may have been searched with a floor read after this node started, and a score at or below it is only
+        # an upper bound
+        if best <= alphaOrig or search.floor < betaOrig and best <= search.floor:
+            flag = TranspositionTable.UPPER
+        elif best >= betaOrig:
+            flag = TranspositionTable.LOWER
+        else:
+            flag = TranspositionTable.EXACT
+        table.store(key, maxDepth - depth, best, flag, bestMove)
+    return best, bestMove, _line(search, depth, size)
 
 
-def performGame(heur1, heur2, boardSize):
+def _updateLine(search, depth, index):
+    """
+    Make the line from the node at depth the move followed by the line from the child just searched
+    :param search: the Search
+    :param depth: the depth of the node
+    :param index: the flat index of the move
+    """
+    line = search.pv[depth]
+    child = search.pv[depth + 1]
+    length = search.pvLength[depth + 1]
+    line[depth] = index
+    for k in range(depth + 1, length):
+        line[k] = child[k]
+    search.pvLength[depth] = max(length, depth + 1)
+
+
+def _line(search, depth, size):
+    """
+    :return: the best line from the root as a list of [row, col] when depth is 0, None otherwise
+    """
+    if depth != 0:
+        return None
+    return search.principalVariation(size)
+
+
+def aspiration(board, player, size, search, previous):
+    """
+    Search the root with a window of aspirationWindows[numberOfHeuristic] around the previous iteration's score. If the
+    score falls outside the window, the root is searched again with the full window.
+
+    :param board: a board object
+    :param player: either 1 or 2, the player to find a move for
+    :param size: the board size
+    :param search: the Search
+    :param previous: the score of the previous iteration
+
+    :return: heuristic score, the flat index of the best move, the best line as a list of [row, col]
+    """
+    if aspirationWindows is not None:
+        low = previous - aspirationWindows[numberOfHeuristic]
+        high = previous + aspirationWindows[numberOfHeuristic]
+        best, move, line = minmax(0, board, True, player, low, high, size, search)
+        if low < best < high:
+            return best, move, line
+        search.researches += 1
+    return minmax(0, board, True, player, ninfi, pinfi, size, search)
+
+
+def iterativeDeepening(board, player, size, timeLimit, table=None, maxDepth=None):
+    """
+    Search depth 1, 2, 3... with minmax until the time limit is used up. Each iteration searches the best move of the
+    previous one first. Depth 1 is always finished, so there is always a move to play.
+
+    :param board: a board object
+    :param player: either 1 or 2, the player to find a move for
+    :param size: the board size
+    :param timeLimit: the time limit in seconds
+    :param table: an optional TranspositionTable, see minmax
+    :param maxDepth: an optional depth to stop at
+
+    :return: heuristic score, the flat index of the best move, the best line as a list of [row, col], all from the
+    deepest search that finished
+    """
+    deadline = time.time() + timeLimit
+    search = Search(table, 1)
+    undoDepth = len(board.undo)
+    best, move, line = minmax(0, board, True, player, ninfi, pinfi, size, search)
+    while best != pinfi and best != ninfi and (maxDepth is None or search.maxDepth < maxDepth):
+        if time.time() >= deadline:
+            break
+        search.maxDepth += 1
+        search.deadline = deadline
+        search.rootMove = move
+        try:
+            best, move, line = aspiration(board, player, size, search, best)
+        except SearchTimeout:
+            # Take back the moves the unfinished search left on the board
+            while len(board.undo) > undoDepth:
+                board.unmakeMove()
+            break
+    return best, move, line
+
+
+# The alpha bound shared by the worker processes of a ParallelSearch, and the number of the search it belongs to, set in
+# each worker by _initWorker. The generation is only read and written under the lock of the alpha
+_sharedAlpha = None
+_sharedGeneration = None
+# The transposition tables of a worker process, one for each (player, heuristic, board size), with the number of the
+# tables of the ParallelSearch they were made for
+_workerTables = {}
+
+
+def _initWorker(alpha, generation):
+    global _sharedAlpha, _sharedGeneration
+    _sharedAlpha = alpha
+    _sharedGeneration = generation
+
+
+def _searchRootMove(task):
+    """
+    Search the position after one root move, in a worker process of a ParallelSearch. The search starts from the
+    shared alpha bound, keeps reading it while it runs, and raises it if it finds something better. A task left over
+    from an earlier search, which ran out of time, does not start and does not raise the bound of the current one.
+
+    :param task: (position in the root order, move, board cells, captures, player, board size, depth, deadline,
+    generation of the search, number of the tables, (numberOfHeuristic, candidateRadius, moveOrdering,
+    principalVariation))
+    :return: (position in the root order, score, the highest alpha the search used, nodes), or None if the search ran
+    out of time or is over
+    """
+    global numberOfHeuristic, candidateRadius, moveOrdering, principalVariation
+    order, move, cells, captures, player, size, depth, deadline, generation, tables, settings = task
+    with _sharedAlpha.get_lock():
+        if _sharedGeneration.value != generation:
+            return None
+        alpha = _sharedAlpha.value
+    numberOfHeuristic, candidateRadius, moveOrdering, principalVariation = settings
+    key = (player, numberOfHeuristic, size)
+    if key not in _workerTables or _workerTables[key][0] != tables:
+        _workerTables[key] = (tables, TranspositionTable.TranspositionTable())
+
+    board = Board(size)
+    board.board = pente.FlatBoard(size, bytearray(cells))
+    board.captures = list(captures)
+    if candidateRadius is not None:
+        board.candidates = Candidates.Candidates(board.board, candidateRadius)
+    board.makeMove(move, player)
+
+    search = Search(_workerTables[key][1], depth, deadline, _sharedAlpha)
+    search.floor = alpha
+    try:
+        val = minmax(1, board, False, player, alpha, pinfi, size, search)[0]
+    except SearchTimeout:
+        return None
+    with _sharedAlpha.get_lock():
+        if _sharedGeneration.value == generation and val > _sharedAlpha.value:
+            _sharedAlpha.value = val
+    return order, val, search.floor, search.nodes
+
+
+class ParallelSearch:
+    """
+    A pool of worker processes that split the root moves of an alpha beta search between them. The workers share the
+    best score found so far as their alpha bound and read it at every node, so a move is cut off by a better score
+    found by another worker even while it is being searched. The pool is meant to be made once and used for every move
+    of a game. Each worker keeps a transposition table for each player and heuristic until newTables is called.
+
+    :param workers: the number of worker processes
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.alpha = multiprocessing.Value('d', ninfi)
+        # Counts the searches, so the tasks of a search that ran out of time can tell they are over
+        self.generation = multiprocessing.Value('i', 0, lock=False)
+        self.pool = multiprocessing.Pool(workers, initializer=_initWorker, initargs=(self.alpha, self.generation))
+        # The number of nodes searched by the workers in the last search
+        self.nodes = 0
+        # Counts the calls to newTables. A worker makes new tables when a task comes with a number it has not seen
+        self.tables = 0
+
+    def search(self, board, player, size, maxDepth, deadline=None, rootMove=-1):
+        """
+        Find the best move with a parallel alpha beta search.
+
+        :param board: a board object
+        :param player: either 1 or 2, the player to find a move for
+        :param size: the board size
+        :param maxDepth: the depth to search to
+        :param deadline: an optional time.time() value the workers stop at
+        :param rootMove: the flat index of a root move to search first, or -1
+
+        :return: heuristic score, the [row, col] of the move, or None for the move if there is no move to play. None
+        if the search ran out of time
+        """
+        if candidateRadius is not None:
+            board.candidates = Candidates.Candidates(board.board, candidateRadius)
+        childArray = board.getCandidatePositions()
+        if len(childArray) == 0:
+            return getHeu(board.board, player, board.captures)[2], None
+        ordering = Search(None, maxDepth)
+        ordering.killers.append([-1, -1])
+        ordering.history = [None, [0] * (size * size), [0] * (size * size)]
+        childArray = orderMoves(board, childArray, player, 0, ordering, rootMove, size)
+
+        # The tasks of the last search may still be queued or running if it ran out of time. They are told apart by the
+        # generation, and their results go to the iterator of that search, which is dropped
+        with self.alpha.get_lock():
+            self.generation.value += 1
+            self.alpha.value = ninfi
+            generation = self.generation.value
+        cells = bytes(board.board.cells)
+        settings = (numberOfHeuristic, candidateRadius, moveOrdering, principalVariation)
+        tasks = [(i, a, cells, tuple(board.captures), player, size, maxDepth, deadline, generation, self.tables,
+                  settings) for i, a in enumerate(childArray)]
+        results = []
+        self.nodes = 0
+        for result in self.pool.imap_unordered(_searchRootMove, tasks):
+            if result is None:
+                return None
+            results.append(result)
+            self.nodes += result[3]
+
+        # A score is only exact if it is better than the highest alpha its search used. The first move that reached
+        # the best score was searched with a lower alpha, so the best score always has an exact result
+        best = None
+        for order, val, alpha, nodes in results:
+            if val > alpha or alpha <= ninfi:
+                if best is None or val > best[1] or (val == best[1] and order < best[0]):
+                    best = (order, val)
+        return best[1], childArray[best[0]]
+
+    def newTables(self):
+        """
+        Make the workers start the next search with empty transposition tables, like a search given a new table
+        """
+        self.tables += 1
+
+    def close(self):
+        """
+        Stop the worker processes
+        """
+        self.pool.terminate()
+        self.pool.join()
+
+
+def findNextMove(board, player, size, table=None, pool=None):
+    """
+    Find the next move with alpha beta pruning, using the module settings. If timeLimit is set the search is an
+    iterative deepening one with that many seconds per move, otherwise it is a bigDepth deep search.
+
+    :param board: a board object
+    :param player: either 1 or 2, the player to find a move for
+    :param size: the board size
+    :param table: an optional TranspositionTable, see minmax
+    :param pool: an optional ParallelSearch to split the search between processes. The workers keep their own
+    transposition tables, so table is not used then
+
+    :return: heuristic score, the [row, col] of the move. The move is None if there is no move to play, when the board
+    is full
+    """
+    if pool is not None:
+        if timeLimit is None:
+            return pool.search(board, player, size, bigDepth)
+        deadline = time.time() + timeLimit
+        value, move = pool.search(board, player, size, 1)
+        depth = 1
+        while move is not None and value != pinfi and value != ninfi and time.time() < deadline:
+            depth += 1
+            found = pool.search(board, player, size, depth, deadline, move[0] * size + move[1])
+            if found is None:
+                break
+            value, move = found
+        return value, move
+
+    if timeLimit is None:
+        value, move, line = minmax(0, board, True, player, ninfi, pinfi, size, Search(table))
+    else:
+        value, move, line = iterativeDeepening(board, player, size, timeLimit, table)
+    if move < 0:
+        return value, None
+    return value, [move // size, move % size]
+
+
+def performGame(heur1, heur2, boardSize, workers=1):
     """
     The implementation of the alpha beta pruning.
 
     :param heur1: the heuristic for the first player, can be 1 - 10(see the numberOfHeuristic variable)
     :param heur2: the heuristic for the second player, can be 1 - 10(see the numberOfHeuristic variable)
     :param boardSize: the size for the pente board(x by x)
+    :param workers: the number of processes each search is split between
 
-    :return: 1 if player 1 wins or 2 if player 2 wins, board of the final round
+    :return: 1 if player 1 wins or 2 if player 2 wins, 0 for a draw when the board is full, board of the final round
     """
 
     # Assign the heuristics
     global numberOfHeuristic
     # performGame between two heuristics
-    game = pente.make_board(boardSize)
+    game = pente.FlatBoard(boardSize)
     player = 1
     i = 0
     captures = [0, 0]
@@ -266,34 +802,44 @@ def performGame(heur1, heur2, boardSize):
     board = Board(boardSize)
     board.board = game
 
-    while True:
-        # print(i)
-        i += 1
-        # print('player ', player)
-        # Player 1
-        if i % 2 != 0:
-            numberOfHeuristic = heur1
-            v, result = minmax(0, board, True, player, ninfi, pinfi, boardSize)
-        # Player 2
-        else:
-            numberOfHeuristic = heur2
-            v, result = minmax(0, board, True, player, ninfi, pinfi, boardSize)
-        # board.printBoard()
-        move = result.moves[0]['move']
-        # print('move', move)
-        game, captures, win = pente.update_board(game, captures, player, move[0], move[1])
-        # print('captures', captures)
-        # pente.print_board(game)
-        # board, heuristics, score = AdjacentPieces.calculate_heuristic(game, 3 - player)
-        # print('sc', heuristics)
-        if win != 0:
-            # print(win, "win!!!!!")
-            # print(numberOfHeuristic)
-            return win, game
-        player = 3 - player
-        board = Board(boardSize)
-        board.board = game
-        board.captures = copy.deepcopy(captures)
+    # Each player keeps its own transposition table for the whole game, since the scores depend on its heuristic
+    tables = {1: TranspositionTable.TranspositionTable(), 2: TranspositionTable.TranspositionTable()}
+    pool = ParallelSearch(workers) if workers > 1 else None
+
+    try:
+        while True:
+            # print(i)
+            i += 1
+            # print('player ', player)
+            # Player 1
+            if i % 2 != 0:
+                numberOfHeuristic = heur1
+                v, move = findNextMove(board, player, boardSize, tables[player], pool)
+            # Player 2
+            else:
+                numberOfHeuristic = heur2
+                v, move = findNextMove(board, player, boardSize, tables[player], pool)
+            if move is None:
+                # The board is full, the game is a draw
+                return 0, game
+            # board.printBoard()
+            # print('move', move)
+            game, captures, win = pente.update_board(game, captures, player, move[0], move[1])
+            # print('captures', captures)
+            # pente.print_board(game)
+            # board, heuristics, score = AdjacentPieces.calculate_heuristic(game, 3 - player)
+            # print('sc', heuristics)
+            if win != 0:
+                # print(win, "win!!!!!")
+                # print(numberOfHeuristic)
+                return win, game
+            player = 3 - player
+            board = Board(boardSize)
+            board.board = game
+            board.captures = copy.deepcopy(captures)
+    finally:
+        if pool is not None:
+            pool.close()
 
 
 if __name__ == '__main__':
@@ -1,6 +1,7 @@
 import math
 import copy
 import ABpruning
+import TranspositionTable
 import MCTS
 import pente
 import sys
@@ -8,24 +9,28 @@ import sys
 pinfi = sys.maxsize
 ninfi = -sys.maxsize
 
-def performGame(heur1, heur2, boardSize):
+def performGame(heur1, heur2, boardSize, workers=1):
     """
     The implementation of the alpha beta pruning.
 
     :param heur1: the heuristic for the first player, can be 1 - 10(see the numberOfHeuristic variable)
     :param heur2: the heuristic for the second player, can be 1 - 10(see the numberOfHeuristic variable)
     :param boardSize: the size for the pente board(x by x)
+    :param workers: the number of processes each alpha beta search is split between
 
-    :return: 1 if player 1 wins or 2 if player 2 wins, board of the final round
+    :return: 1 if player 1 wins or 2 if player 2 wins, 0 for a draw when the board is full, board of the final round
     """
 
     # performGame between two heuristics
-    game = pente.make_board(boardSize)
+    game = pente.FlatBoard(boardSize)
     player = 1
     i = 0
     captures = [0, 0]
 
     mcts = MCTS.MCTS(boardSize)
+    # The alpha beta player keeps its transposition table for the whole game
+    table = TranspositionTable.TranspositionTable()
+    pool = ABpruning.ParallelSearch(workers) if workers > 1 else None
     # Place the first stone at the middle
     # print(i)
     i += 1
@@ -39,63 +44,73 @@ def performGame(heur1, heur2, boardSize):
     player = 3 - player
     # pente.print_board(game)
 
-    board = ABpruning.Board()
+    board = ABpruning.Board(boardSize)
     board.board = game
     mtboard = MCTS.Board(boardSize)
     mtboard.board = game
 
-    while True:
-        # print(i)
-        i += 1
-        # print('player ', player)
-        # Player 1
-        if i % 2 != 0:
-            ABpruning.numberOfHeuristic = heur1
-            # print('he', ABpruning.numberOfHeuristic)
-            v, result = ABpruning.minmax(0, board, True, player, ninfi, pinfi)
-            move = result.moves[0]['move']
-        # Player 2
-        else:
-            move, board = mcts.findNextMove(board, player, heur2)
-        # board.printBoard()
-        # print('move', move)
-        game, captures, win = pente.update_board(game, captures, player, move[0], move[1])
-        # print('captures', captures)
-        # pente.print_board(game)
-        # board, heuristics, score = AdjacentPieces.calculate_heuristic(game, 3 - player)
-        # print('sc', heuristics)
-        if win != 0:
-            # print(win, "win!!!!!")
-            # print(numberOfHeuristic)
-            return win, game
-        player = 3 - player
-        board = ABpruning.Board()
-        board.board = game
-        board.captures = copy.deepcopy(captures)
-
-        mtboard = MCTS.Board(boardSize)
-        mtboard.board = game
-        mtboard.captures = copy.deepcopy(captures)
-
-
-def performGameS(heur1, heur2, boardSize):
+    try:
+        while True:
+            # print(i)
+            i += 1
+            # print('player ', player)
+            # Player 1
+            if i % 2 != 0:
+                ABpruning.numberOfHeuristic = heur1
+                # print('he', ABpruning.numberOfHeuristic)
+                v, move = ABpruning.findNextMove(board, player, boardSize, table, pool)
+                if move is None:
+                    # The board is full, the game is a draw
+                    return 0, game
+            # Player 2
+            else:
+                move, board = mcts.findNextMove(board, player, heur2)
+            # board.printBoard()
+            # print('move', move)
+            game, captures, win = pente.update_board(game, captures, player, move[0], move[1])
+            # print('captures', captures)
+            # pente.print_board(game)
+            # board, heuristics, score = AdjacentPieces.calculate_heuristic(game, 3 - player)
+            # print('sc', heuristics)
+            if win != 0:
+                # print(win, "win!!!!!")
+                # print(numberOfHeuristic)
+                return win, game
+            player = 3 - player
+            board = ABpruning.Board(boardSize)
+            board.board = game
+            board.captures = copy.deepcopy(captures)
+
+            mtboard = MCTS.Board(boardSize)
+            mtboard.board = game
+            mtboard.captures = copy.deepcopy(captures)
+    finally:
+        if pool is not None:
+            pool.close()
+
+
+def performGameS(heur1, heur2, boardSize, workers=1):
     """
     The implementation of the alpha beta pruning.
 
     :param heur1: the heuristic for the first player, can be 1 - 10(see the numberOfHeuristic variable)
     :param heur2: the heuristic for the second player, can be 1 - 10(see the numberOfHeuristic variable)
     :param boardSize: the size for the pente board(x by x)
+    :param workers: the number of processes each alpha beta search is split between
 
-    :return: 1 if player 1 wins or 2 if player 2 wins, board of the final round
+    :return: 1 if player 1 wins or 2 if player 2 wins, 0 for a draw when the board is full, board of the final round
     """
 
     # performGame between two heuristics
-    game = pente.make_board(boardSize)
+    game = pente.FlatBoard(boardSize)
     player = 1
     i = 0
     captures = [0, 0]
 
     mcts = MCTS.MCTS(boardSize)
+    # The alpha beta player keeps its transposition table for the whole game
+    table = TranspositionTable.TranspositionTable()
+    pool = ABpruning.ParallelSearch(workers) if workers > 1 else None
     # Place the first stone at the middle
     # print(i)
     i += 1
@@ -109,42 +124,48 @@ def performGameS(heur1, heur2, boardSize):
     player = 3 - player
     # pente.print_board(game)
 
-    board = ABpruning.Board()
+    board = ABpruning.Board(boardSize)
     board.board = game
     mtboard = MCTS.Board(boardSize)
     mtboard.board = game
 
-    while True:
-        # print(i)
-        i += 1
-        # print('player ', player)
-        # Player 1
-        if i % 2 != 0:
-            move, board = mcts.findNextMove(board, player, heur1)
-        # Player 2
-        else:
-            ABpruning.numberOfHeuristic = heur2
-            # print('he', ABpruning.numberOfHeuristic)
-            v, result = ABpruning.minmax(0, board, True, player, ninfi, pinfi)
-            move = result.moves[0]['move']
-        # board.printBoard()
-        # print('move', move)
-        game, captures, win = pente.update_board(game, captures, player, move[0], move[1])
-        # print('captures', captures)
-        # pente.print_board(game)
-        # print('sc', heuristics)
-        if win != 0:
-            # print(win, "win!!!!!")
-            # print(numberOfHeuristic)
-            return win, game
-        player = 3 - player
-        board = ABpruning.Board()
-        board.board = game
-        board.captures = copy.deepcopy(captures)
-
-        mtboard = MCTS.Board(boardSize)
-        mtboard.board = game
-        mtboard.captures = copy.deepcopy(captures)
+    try:
+        while True:
+            # print(i)
+            i += 1
+            # print('player ', player)
+            # Player 1
+            if i % 2 != 0:
+                move, board = mcts.findNextMove(board, player, heur1)
+            # Player 2
+            else:
+                ABpruning.numberOfHeuristic = heur2
+                # print('he', ABpruning.numberOfHeuristic)
+                v, move = ABpruning.findNextMove(board, player, boardSize, table, pool)
+                if move is None:
+                    # The board is full, the game is a draw
+                    return 0, game
+            # board.printBoard()
+            # print('move', move)
+            game, captures, win = pente.update_board(game, captures, player, move[0], move[1])
+            # print('captures', captures)
+            # pente.print_board(game)
+            # print('sc', heuristics)
+            if win != 0:
+                # print(win, "win!!!!!")
+                # print(numberOfHeuristic)
+                return win, game
+            player = 3 - player
+            board = ABpruning.Board(boardSize)
+            board.board = game
+            board.captures = copy.deepcopy(captures)
+
+            mtboard = MCTS.Board(boardSize)
+            mtboard.board = game
+            mtboard.captures = copy.deepcopy(captures)
+    finally:
+        if pool is not None:
+            pool.close()
 
 if __name__ == '__main__':
 
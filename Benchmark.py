@@ -0,0 +1,400 @@
+# Benchmarks for the search engines on a fixed set of positions
+import multiprocessing
+import random
+import time
+import ABpruning
+import ConsecutivePieces
+import MCTS
+import pente
+import TranspositionTable
+
+
+def positions(count=8, size=11, seed=520):
+    """
+    Make a fixed set of middle game positions. The same arguments always give the same positions.
+    :param count: the number of positions
+    :param size: the board size
+    :param seed: the seed the positions are made from
+    :return: a list of (FlatBoard, captures, player to move)
+    """
+    rng = random.Random(seed)
+    middle = size // 2
+    result = []
+    while len(result) < count:
+        board = pente.FlatBoard(size)
+        captures = [0, 0]
+        turn = 1
+        win = 0
+        for k in range(rng.randrange(6, 16)):
+            row = middle + rng.randrange(-3, 4)
+            col = middle + rng.randrange(-3, 4)
+            if board[row][col] != 0:
+                continue
+            win = pente.make_move(board, captures, turn, row, col).win
+            if win != 0:
+                break
+            turn = 3 - turn
+        if win == 0:
+            result.append((board, captures, turn))
+    return result
+
+
+def alphaBetaBoard(position):
+    """
+    :param position: a (FlatBoard, captures, player to move) from positions
+    :return: an ABpruning.Board for the position
+    """
+    flat, captures, turn = position
+    board = ABpruning.Board(flat.size)
+    board.board = flat.copy()
+    board.captures = captures[:]
+    return board
+
+
+def alphaBetaSpeedup(workerCounts=None, depth=3, heuristic=1, size=11, count=8):
+    """
+    Time a fixed depth alpha beta search of every benchmark position for each number of workers, and print the
+    speed-up over a single process search. Every search goes through ABpruning.findNextMove with the module's
+    principal variation and aspiration settings and starts from an empty transposition table, so all the rows search
+    the same way.
+    :param workerCounts: the numbers of workers to try. 1, 2, 4, ... up to the number of cores if not given
+    :param depth: the search depth
+    :param heuristic: the ABpruning heuristic number
+    :param size: the board size
+    :param count: the number of positions
+    :return: a list of (workers, seconds, speed-up, nodes, same scores as a single process)
+    """
+    if workerCounts is None:
+        workerCounts = [1]
+        while workerCounts[-1] * 2 <= multiprocessing.cpu_count():
+            workerCounts.append(workerCounts[-1] * 2)
+    ABpruning.bigDepth = depth
+    ABpruning.numberOfHeuristic = heuristic
+    ABpruning.timeLimit = None
+    benchmark = positions(count, size)
+
+    rows = []
+    # The score of every position with one process
+    scores = None
+    for workers in workerCounts:
+        pool = ABpruning.ParallelSearch(workers) if workers > 1 else None
+        nodes = 0
+        found = []
+        start = time.time()
+        for position in benchmark:
+            board = alphaBetaBoard(position)
+            if pool is None:
+                table = TranspositionTable.TranspositionTable()
+                found.append(ABpruning.findNextMove(board, position[2], size, table)[0])
+                # Every node probes the table once
+                nodes += table.hits + table.misses
+            else:
+                pool.newTables()
+                found.append(ABpruning.findNextMove(board, position[2], size, pool=pool)[0])
+                nodes += pool.nodes
+        seconds = time.time() - start
+        if pool is not None:
+            pool.close()
+        if scores is None:
+            scores = found
+        rows.append((workers, seconds, rows[0][1] / seconds if len(rows) > 0 else 1.0, nodes, found == scores))
+
+    print("workers  seconds  speed-up  nodes  same scores")
+    for workers, seconds, speedup, nodes, same in rows:
+        print("%7d  %7.2f  %8.2f  %5d  %s" % (workers, seconds, speedup, nodes, same))
+    return rows
+
+
+def principalVariation(depth=3, heuristic=1, size=11, count=8):
+    """
+    Search every benchmark position to a fixed depth with plain alpha beta and with principal variation search, check
+    that both find the same score and move, and print the nodes each needed.
+    :param depth: the search depth
+    :param heuristic: the ABpruning heuristic number
+    :param size: the board size
+    :param count: the number of positions
+    :return: a list of (plain alpha beta nodes, principal variation search nodes, same move) for every position
+    """
+    ABpruning.bigDepth = depth
+    ABpruning.numberOfHeuristic = heuristic
+    setting = ABpruning.principalVariation
+
+    rows = []
+    for position in positions(count, size):
+        found = []
+        for pvs in (False, True):
+            ABpruning.principalVariation = pvs
+            board = alphaBetaBoard(position)
+            # A fresh table for each search, since the re-searches of principal variation search rely on it
+            search = ABpruning.Search(TranspositionTable.TranspositionTable())
+            score, move, line = ABpruning.minmax(0, board, True, position[2], ABpruning.ninfi, ABpruning.pinfi,
+                                                 size, search)
+            found.append((score, move, search.nodes))
+        rows.append((found[0][2], found[1][2], found[0][:2] == found[1][:2]))
+    ABpruning.principalVariation = setting
+
+    print("alpha beta      pvs  reduction  same move")
+    for plain, pvs, same in rows:
+        print("%10d  %7d  %8.1f%%  %s" % (plain, pvs, 100.0 * (plain - pvs) / plain, same))
+    plain = sum(row[0] for row in rows)
+    pvs = sum(row[1] for row in rows)
+    print("%10d  %7d  %8.1f%%  %s" % (plain, pvs, 100.0 * (plain - pvs) / plain, all(row[2] for row in rows)))
+    return rows
+
+
+def rolloutSpeed(heuristics=None, size=11, count=8, rollouts=10):
+    """
+    Play rollouts out from every benchmark position for each MCTS heuristic, once working the heuristic maps out for
+    every move and once with a RolloutPolicy copied from the position like MCTS.simulatePlayout does, check that both
+    play the same games, and print the rollouts per second.
+    :param heuristics: the MCTS heuristic names, all of them if not given
+    :param size: the board size
+    :param count: the number of positions
+    :param rollouts: the number of rollouts from each position, each with its own seed for the random moves
+    :return: a list of (heuristic, rollouts per second, with a RolloutPolicy, same games)
+    """
+    if heuristics is None:
+        heuristics = ['conP', 'mcs', 'mcp', 'capP', 'mom', 'cpc', 'mc', 'cpp', 'mp', 'mcsp']
+    setting = MCTS.fastRollouts
+    benchmark = positions(count, size)
+
+    rows = []
+    for heur in heuristics:
+        found = []
+        for fast in (False, True):
+            MCTS.fastRollouts = fast
+            games = []
+            seconds = 0
+            for k in range(count):
+                flat, captures, turn = benchmark[k]
+                position = MCTS.Board(size)
+                position.board = flat.copy()
+                position.captures = captures[:]
+                # The policy of the position is made once, as on the working board of a search
+                position.usePolicy(heur)
+                if position.policy is not None:
+                    position.policy.copy(position.board)
+                start = time.time()
+                for r in range(rollouts):
+                    board = MCTS.Board(size, position)
+                    board.captures = position.captures[:]
+                    if position.policy is not None:
+                        board.policy = position.policy.copy(board.board)
+                    random.seed(r)
+                    games.append((MCTS.simulate(board, 3 - turn, heur, 3 - turn), bytes(board.board.cells)))
+                seconds += time.time() - start
+            found.append((count * rollouts / seconds, games))
+        rows.append((heur, found[0][0], found[1][0], found[0][1] == found[1][1]))
+    MCTS.fastRollouts = setting
+
+    print("heuristic  rollouts/s  policy/s  speed-up  same games")
+    for heur, plain, fast, same in rows:
+        print("%9s  %10.1f  %8.1f  %8.2f  %s" % (heur, plain, fast, fast / plain, same))
+    return rows
+
+
+def rolloutCutoff(depth=8, heur='cpc', size=11, games=4, iterations=150):
+    """
+    Time playouts from the benchmark positions stopped after depth moves and played to the end. Then play MCTS with
+    the stopped playouts against MCTS with full playouts, with the same number of iterations per move and each side
+    moving first in half the games, and print the playouts and iterations per second of both and the games won. The
+    searches are seeded, so the same arguments play the same games.
+    :param depth: the rolloutDepth of the first engine
+    :param heur: the MCTS heuristic of both
+    :param size: the board size
+    :param games: the number of games
+    :param iterations: the iterations per move
+    :return: (playouts per second with depth, with full playouts, iterations per second with depth, with full
+    playouts, wins with depth, wins with full playouts, draws)
+    """
+    rates = []
+    for limit in (depth, None):
+        count = 0
+        start = time.time()
+        for k, (flat, captures, turn) in enumerate(positions(8, size)):
+            for r in range(4):
+                board = MCTS.Board(size)
+                board.board = flat.copy()
+                board.captures = captures[:]
+                board.usePolicy(heur)
+                board.rng = random.Random(r)
+                MCTS.simulate(board, 3 - turn, heur, 3 - turn, None, limit)
+                count += 1
+        rates.append(count / (time.time() - start))
+
+    settings = (MCTS.timeout, MCTS.iterationBudget, MCTS.rolloutDepth)
+    MCTS.timeout = None
+    MCTS.iterationBudget = iterations
+    # The seconds and iterations with depth and with full playouts, and the games won by each and drawn
+    seconds = [0.0, 0.0]
+    searched = [0, 0]
+    wins = [0, 0, 0]
+    for game in range(games):
+        # The engine with depth plays first in the even games
+        first = game % 2
+        engines = [MCTS.MCTS(size, seed=2 * game), MCTS.MCTS(size, seed=2 * game + 1)]
+        board = MCTS.Board(size)
+        pente.make_move(board.board, board.captures, 1, size // 2, size // 2)
+        player = 2
+        winner = 0
+        while board.status == 0 and 0 in board.board.cells:
+            side = first if player == 1 else 1 - first
+            MCTS.rolloutDepth = depth if side == 0 else None
+            start = time.time()
+            move, board = engines[side].findNextMove(board, player, heur)
+            seconds[side] += time.time() - start
+            searched[side] += engines[side].iterations
+            winner = board.status
+            player = 3 - player
+        if winner == 0:
+            wins[2] += 1
+        else:
+            wins[first if winner == 1 else 1 - first] += 1
+    MCTS.timeout, MCTS.iterationBudget, MCTS.rolloutDepth = settings
+
+    result = (rates[0], rates[1], searched[0] / seconds[0], searched[1] / seconds[1], wins[0], wins[1], wins[2])
+    print("rollout depth  playouts/s  full playouts/s  iterations/s  full iterations/s  wins  full wins  draws")
+    print("%13d  %10.1f  %15.1f  %12.1f  %17.1f  %4d  %9d  %5d" % ((depth,) + result))
+    return result
+
+
+def rootParallelRepeatable(workers=3, heur='cpc', size=9, iterations=600, moves=4, seed=520):
+    """
+    Play the same seeded game from a benchmark position twice, a root parallel MCTS against a single process MCTS, and
+    check that both play the same moves and that the root parallel searches add up the same root statistics. The
+    first game keeps one pool of worker processes for the whole game, the second starts a new pool for every move,
+    so a worker that kept a tree from one move to the next would make them differ.
+    :param workers: the number of worker processes
+    :param heur: the MCTS heuristic of both
+    :param size: the board size
+    :param iterations: the iteration budget of each search, shared by the workers
+    :param moves: the number of moves of each side
+    :param seed: the seed of the root parallel MCTS, the other one gets seed + 1
+    :return: whether both games have the same moves and statistics
+    """
+    settings = (MCTS.timeout, MCTS.iterationBudget)
+    MCTS.timeout = None
+    MCTS.iterationBudget = iterations
+    flat, captures, turn = positions(1, size)[0]
+    found = []
+    for fresh in (False, True):
+        # Both games draw the seeds of the searches from the same sequence
+        rng = random.Random(seed)
+        parallel = MCTS.MCTS(size, workers)
+        parallel.random = rng
+        other = MCTS.MCTS(size, seed=seed + 1)
+        board = MCTS.Board(size)
+        board.board = flat.copy()
+        board.captures = captures[:]
+        player = turn
+        game = []
+        for k in range(2 * moves):
+            if board.status != 0 or 0 not in board.board.cells:
+                break
+            if player == turn:
+                if fresh and k > 0:
+                    parallel.close()
+                    parallel = MCTS.MCTS(size, workers)
+                    parallel.random = rng
+                move, board = parallel.findNextMove(board, player, heur)
+                game.append((move, parallel.rootStats))
+            else:
+                move, board = other.findNextMove(board, player, heur)
+                game.append((move, None))
+            player = 3 - player
+        parallel.close()
+        found.append(game)
+    MCTS.timeout, MCTS.iterationBudget = settings
+
+    same = found[0] == found[1]
+    print("workers  moves  same moves and statistics")
+    print("%7d  %5d  %s" % (workers, len(found[0]), same))
+    return same
+
+
+def smallNodeLimit(limit=10, heur='cpc', size=11, iterations=100, seed=520):
+    """
+    Search a benchmark position with an MCTS nodeLimit smaller than the number of moves at the root, with each
+    limitAction, and check that the root is still expanded and the move played is the most visited one of its
+    children.
+    :param limit: the nodeLimit
+    :param heur: the MCTS heuristic
+    :param size: the board size
+    :param iterations: the iteration budget of each search
+    :param seed: the seed of the MCTS
+    :return: a list of (limitAction, move, root children, root expanded and its most visited child played)
+    """
+    settings = (MCTS.timeout, MCTS.iterationBudget, MCTS.nodeLimit, MCTS.limitAction)
+    MCTS.timeout = None
+    MCTS.iterationBudget = iterations
+    MCTS.nodeLimit = limit
+    flat, captures, turn = positions(1, size)[0]
+    rows = []
+    for action in ('prune', 'stop'):
+        MCTS.limitAction = action
+        engine = MCTS.MCTS(size, seed=seed)
+        board = MCTS.Board(size)
+        board.board = flat.copy()
+        board.captures = captures[:]
+        move, after = engine.findNextMove(board, turn, heur)
+        tree = engine.tree
+        children = tree.childCount[0]
+        best = MCTS.getChildWithMaxScore(tree, 0)
+        played = children > 0 and tree.move[best] == move[0] * size + move[1] and flat[move[0]][move[1]] == 0
+        rows.append((action, move, children, played))
+    MCTS.timeout, MCTS.iterationBudget, MCTS.nodeLimit, MCTS.limitAction = settings
+
+    print("limit action  move      root children  most visited child played")
+    for action, move, children, played in rows:
+        print("%12s  %8s  %13d  %s" % (action, move, children, played))
+    return rows
+
+
+def streakSpeed(sizes=(11, 19), count=64, repeat=5):
+    """
+    Time ConsecutivePieces.calculate_streaks on the benchmark positions with each engine, one board per call, and
+    ConsecutivePieces.streak_grids on all of them as one batch, check that all three agree, and print the boards per
+    second.
+    :param sizes: the board sizes
+    :param count: the number of positions of each size
+    :param repeat: how many times every board is worked out
+    :return: a list of (size, boards per second with 'python', with 'numpy', as a batch, same results)
+    """
+    if ConsecutivePieces.numpy is None:
+        # 'numpy' would fall back to 'python', there is nothing to compare
+        print("NumPy is not installed, there is only the python engine of calculate_streaks")
+        return []
+    rows = []
+    for size in sizes:
+        boards = [flat for flat, captures, turn in positions(count, size)]
+        found = []
+        for engine in ('python', 'numpy'):
+            start = time.time()
+            for r in range(repeat):
+                results = [ConsecutivePieces.calculate_streaks(board, 1, engine)[1:] for board in boards]
+            found.append((count * repeat / (time.time() - start), results))
+        numpy = ConsecutivePieces.numpy
+        cells = numpy.frombuffer(b''.join(board.cells for board in boards), numpy.uint8).reshape(count, size, size)
+        start = time.time()
+        for r in range(repeat):
+            heuristics, scores = ConsecutivePieces.streak_grids(cells, 1)
+        batch = count * repeat / (time.time() - start)
+        same = found[0][1] == found[1][1] and \
+            [(grid.rows(), score) for grid, score in found[0][1]] == \
+            [(heuristics[k].tolist(), int(scores[k])) for k in range(count)]
+        rows.append((size, found[0][0], found[1][0], batch, same))
+
+    print("size  python boards/s  numpy boards/s  batch boards/s  same results")
+    for size, python, single, batch, same in rows:
+        print("%4d  %15.1f  %14.1f  %14.1f  %s" % (size, python, single, batch, same))
+    return rows
+
+
+if __name__ == '__main__':
+    rolloutSpeed()
+    streakSpeed()
+    rootParallelRepeatable()
+    smallNodeLimit()
+    rolloutCutoff()
+    principalVariation()
+    alphaBetaSpeedup()
@@ -0,0 +1,115 @@
+from array import array
+
+# Per (board size, radius) lists of the neighbours of every flat index, built the first time they are used
+_neighbours = {}
+
+
+def neighbours(size, radius):
+    """
+    :param size: the board size
+    :param radius: how far away (in rows and columns) a neighbour can be
+    :return: a list with, for every flat index, the flat indices of the cells around it (not including itself)
+    """
+    if (size, radius) not in _neighbours:
+        table = []
+        for row in range(size):
+            for col in range(size):
+                near = []
+                for r in range(max(0, row - radius), min(size, row + radius + 1)):
+                    for c in range(max(0, col - radius), min(size, col + radius + 1)):
+                        if r != row or c != col:
+                            near.append(r * size + c)
+                table.append(near)
+        _neighbours[(size, radius)] = table
+    return _neighbours[(size, radius)]
+
+
+class Candidates:
+    """
+    The empty cells that are within radius rows and columns of a stone, which is where almost every sensible Pente
+    move is. The set is kept up to date as stones are placed and captured, instead of being worked out from scratch.
+
+    :param board: the FlatBoard to follow. Its stones have to be changed through make_move and unmake_move, with every
+    MoveRecord passed to apply and undo
+    :param radius: how far from a stone a candidate can be
+    :param source: an optional Candidates for a copy of board, to copy instead of working the candidates out
+    """
+
+    def __init__(self, board, radius=2, source=None):
+        self.board = board
+        self.radius = radius
+        self.neighbours = neighbours(board.size, radius)
+        if source is not None:
+            self.near = source.near[:]
+            self.cells = set(source.cells)
+            return
+
+        # near[index] is the number of stones around index
+        self.near = array('H', bytes(2 * len(board.cells)))
+        self.cells = set()
+        for index, cell in enumerate(board.cells):
+            if cell != 0:
+                for n in self.neighbours[index]:
+                    self.near[n] += 1
+        for index, cell in enumerate(board.cells):
+            if cell == 0 and self.near[index] > 0:
+                self.cells.add(index)
+
+    def copy(self, board):
+        """
+        :param board: a copy of the board this follows
+        :return: a Candidates for the copied board, without working it out from scratch
+        """
+        return Candidates(board, self.radius, self)
+
+    def place(self, index):
+        """
+        Update the candidates after a stone was placed on index
+        """
+        cells = self.board.cells
+        near = self.near
+        for n in self.neighbours[index]:
+            near[n] += 1
+            if cells[n] == 0:
+                self.cells.add(n)
+        self.cells.discard(index)
+
+    def remove(self, index):
+        """
+        Update the candidates after the stone on index was taken off the board
+        """
+        near = self.near
+        for n in self.neighbours[index]:
+            near[n] -= 1
+            if near[n] == 0:
+                self.cells.discard(n)
+        if near[index] > 0:
+            self.cells.add(index)
+
+    def apply(self, record):
+        """
+        Update the candidates after make_move
+        :param record: the MoveRecord returned by make_move
+        """
+        self.place(record.index)
+        for i in record.removed:
+            self.remove(i)
+
+    def undo(self, record):
+        """
+        Update the candidates after unmake_move
+        :param record: the MoveRecord that was taken back
+        """
+        for i in record.removed:
+            self.place(i)
+        self.remove(record.index)
+
+    def positions(self):
+        """
+        :return: the candidate moves as [row, col] in row-major order. On a board without stones every empty cell is a
+        candidate
+        """
+        size = self.board.size
+        if len(self.cells) == 0:
+            return [[index // size, index % size] for index, cell in enumerate(self.board.cells) if cell == 0]
+        return [[index // size, index % size] for index in sorted(self.cells)]
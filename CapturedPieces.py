@@ -1,4 +1,4 @@
-import copy
+import pente
 
 
 def captured_pieces(board, captures, turn):
@@ -13,79 +13,90 @@ def captured_pieces(board, captures, turn):
     :param captures: a 2-element list for keeping track of captured pieces. 1st element is player 1, 2nd is player 2
     :param turn: either 1 or 2, depending on if the 1st or 2nd player is wanting to place a piece
 
-    :return: current board, board with heuristic values, and a score that is calculated based on the heuristic
+    :return: current board, board with heuristic values as a FlatBoard, and a score that is calculated based on the
+    heuristic
     """
-    size = len(board)
-    heuristics = copy.deepcopy(board)
+    flat = pente.to_flat(board)
+    size = flat.size
+    # The stones are read from the cells and the values written to a copy of them, cell (i, j) is at i * size + j
+    cells = flat.cells
+    heuristics = bytearray(cells)
     opponent = 2 if turn == 1 else 1                           # Getting the opponent
     possible_captures_turn = 0
     possible_captures_opponent = 0
 
-    for i in range(size):
-        for j in range(size):
-            if board[i][j] == turn:
-                for axis in [(1, 0), (0, 1), (1, 1), (1, -1)]:                      # Four axes that we consider
-                    count = 0
-                    for k in range(1, 4):
-                        row_change = k * axis[0]
-                        col_change = k * axis[1]
+    # The stones of each player are found with bytearray.find, in row-major order
+    index = cells.find(turn)
+    while index >= 0:
+        i, j = divmod(index, size)
+        for axis in [(1, 0), (0, 1), (1, 1), (1, -1)]:                              # Four axes that we consider
+            step = axis[0] * size + axis[1]
+            count = 0
+            for k in range(1, 4):
+                row_change = k * axis[0]
+                col_change = k * axis[1]
 
-                        if 0 <= i + row_change < size and 0 <= j + col_change < size:
-                            node = board[i + row_change][j + col_change]
-                            if node == opponent and count < 2:
-                                count += 1
-                                continue
-                            elif node != turn and node != opponent and count == 2:
-                                possible_captures_turn += 1
-                                heuristics[i + row_change][j + col_change] = 3
-                            break
-                        break
-                    count = 0
-                    for k in range(1, 4):
-                        row_change = k * axis[0]
-                        col_change = k * axis[1]
+                if 0 <= i + row_change < size and 0 <= j + col_change < size:
+                    node = cells[index + k * step]
+                    if node == opponent and count < 2:
+                        count += 1
+                        continue
+                    elif node != turn and node != opponent and count == 2:
+                        possible_captures_turn += 1
+                        heuristics[index + k * step] = 3
+                    break
+                break
+            count = 0
+            for k in range(1, 4):
+                row_change = k * axis[0]
+                col_change = k * axis[1]
 
-                        if 0 <= i - row_change < size and 0 <= j - col_change < size:
-                            node = board[i - row_change][j - col_change]
-                            if node == opponent and count < 2:
-                                count += 1
-                                continue
-                            elif node != turn and node != opponent and count == 2:
-                                possible_captures_turn += 1
-                                heuristics[i - row_change][j - col_change] = 3
-                            break
-                        break
+                if 0 <= i - row_change < size and 0 <= j - col_change < size:
+                    node = cells[index - k * step]
+                    if node == opponent and count < 2:
+                        count += 1
+                        continue
+                    elif node != turn and node != opponent and count == 2:
+                        possible_captures_turn += 1
+                        heuristics[index - k * step] = 3
+                    break
+                break
+        index = cells.find(turn, index + 1)
 
-            if board[i][j] == opponent:
-                for axis in [(1, 0), (0, 1), (1, 1), (1, -1)]:                      # Four axes that we consider
-                    count = 0
-                    for k in range(1, 4):
-                        row_change = k * axis[0]
-                        col_change = k * axis[1]
+    index = cells.find(opponent)
+    while index >= 0:
+        i, j = divmod(index, size)
+        for axis in [(1, 0), (0, 1), (1, 1), (1, -1)]:                              # Four axes that we consider
+            step = axis[0] * size + axis[1]
+            count = 0
+            for k in range(1, 4):
+                row_change = k * axis[0]
+                col_change = k * axis[1]
 
-                        if 0 <= i + row_change < size and 0 <= j + col_change < size:
-                            node = board[i + row_change][j + col_change]
-                            if node == turn and count < 2:
-                                count += 1
-                                continue
-                            elif node != turn and node != opponent and count == 2:
-                                possible_captures_opponent += 1
-                            break
-                        break
-                    count = 0
-                    for k in range(1, 4):
-                        row_change = k * axis[0]
-                        col_change = k * axis[1]
+                if 0 <= i + row_change < size and 0 <= j + col_change < size:
+                    node = cells[index + k * step]
+                    if node == turn and count < 2:
+                        count += 1
+                        continue
+                    elif node != turn and node != opponent and count == 2:
+                        possible_captures_opponent += 1
+                    break
+                break
+            count = 0
+            for k in range(1, 4):
+                row_change = k * axis[0]
+                col_change = k * axis[1]
 
-                        if 0 <= i - row_change < size and 0 <= j - col_change < size:
-                            node = board[i - row_change][j - col_change]
-                            if node == turn and count < 2:
-                                count += 1
-                                continue
-                            elif node != turn and node != opponent and count == 2:
-                                possible_captures_opponent += 1
-                            break
-                        break
+                if 0 <= i - row_change < size and 0 <= j - col_change < size:
+                    node = cells[index - k * step]
+                    if node == turn and count < 2:
+                        count += 1
+                        continue
+                    elif node != turn and node != opponent and count == 2:
+                        possible_captures_opponent += 1
+                    break
+                break
+        index = cells.find(opponent, index + 1)
 
     score = captures[0] + possible_captures_turn - captures[1] - possible_captures_opponent
-    return board, heuristics, score
+    return board, pente.FlatBoard(size, heuristics, 0), score
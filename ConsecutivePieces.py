@@ -1,7 +1,27 @@
-import copy
+import random
+import pente
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
+# The engine calculate_streaks uses when a call does not pick one: 'python' for the loops below, or 'numpy' for
+# streak_grids. 'numpy' falls back to 'python' where NumPy is missing
+default_engine = 'python'
 
-def calculate_streaks(board, turn):
+# The four axes calculate_streaks goes along, in its order
+AXES = [(1, 0), (0, 1), (1, 1), (1, -1)]
+# The stones that can write into an empty cell, as (row offset, column offset, axis, m) from the cell. m is 0 for the
+# stone just after the cell along the axis, which writes from its left side, and otherwise the length of the streak that
+# ends just before the cell, whose first stone writes from its right side. A cell gets at most one write from each
+# stone, so sorted by offset they are in the order calculate_streaks goes over the stones (row-major)
+WRITES = sorted([(axis[0], axis[1], axis, 0) for axis in AXES] +
+                [(-m * axis[0], -m * axis[1], axis, m) for axis in AXES for m in range(1, 5)])
+# The border streak_grids pads boards with, so every offset it looks at is a slice
+PAD = 5
+
+
+def calculate_streaks(board, turn, engine=None):
     """
     Detects streaks (consecutive placements of stones) for the given board and turn. Outputs a score based on how ideal
     a position is for the next placement, based on the current streaks.
@@ -17,64 +37,190 @@ def calculate_streaks(board, turn):
 
     :param board: a Pente game board
     :param turn: either 1 or 2, depending on if the 1st or 2nd player is wanting to place a piece
+    :param engine: 'python' or 'numpy', default_engine if not given. Both give the same result
 
-    :return: current board, board with heuristic values, and a score that is calculated based on the heuristic
+    :return: current board, board with heuristic values as a FlatBoard, and a score that is calculated based on the
+    heuristic
     """
 
-    size = len(board)
-    heuristics = copy.deepcopy(board)
+    flat = pente.to_flat(board)
+    size = flat.size
+    if (engine or default_engine) == 'numpy' and numpy is not None:
+        heuristics, score = streak_grids(numpy.frombuffer(flat.cells, numpy.uint8).reshape(size, size), turn)
+        return board, pente.FlatBoard(size, bytearray(heuristics.astype(numpy.uint8).tobytes()), 0), int(score)
+
+    # The stones are read from the cells and the values written to a copy of them, cell (i, j) is at i * size + j
+    cells = flat.cells
+    heuristics = bytearray(cells)
     opponent = 2 if turn == 1 else 1                                       # Getting the opponent
     values = {6: 4, 5: 3, 4: 2, 3: 1, 0: 0}                                # Heuristics to streak mapping
     streaks = {4: 6, 3: 5, 2: 4, 1: 3, 0: 0}                               # Streaks to heuristics mapping
 
-    for i in range(size):
-        for j in range(size):
-            if board[i][j] == turn:
-                for axis in [(1, 0), (0, 1), (1, 1), (1, -1)]:             # Four axes that we consider
-                    count = 3                                              # To count the streak
-                    for k in range(1, 5):
-                        row_change = k * axis[0]
-                        col_change = k * axis[1]
-
-                        if 0 <= i + row_change < size and 0 <= j + col_change < size:
-                            node = board[i + row_change][j + col_change]
-                            if node == turn:
-                                count += 1
-                                continue
-                            break
-                        break
-
-                    # Setting the heuristic value of the node that is adjacent to the streak from the left side
-                    if 0 <= i - axis[0] < size and 0 <= j - axis[1] < size:
-                        left_node = heuristics[i - axis[0]][j - axis[1]]
-                        if left_node != turn and left_node != opponent and left_node == 0:
-                            heuristics[i - axis[0]][j - axis[1]] = count
-                        elif left_node != turn and left_node != opponent and 0 <= i - 2 * axis[0] < size and 0 <= j - 2 * axis[1] < size:
-                            if heuristics[i - 2 * axis[0]][j - 2 * axis[1]] == turn:
-                                streak = values[heuristics[i - axis[0]][j - axis[1]]] + values[count]
-                                if streak > 4:
-                                    streak = 4
-                                heuristics[i - axis[0]][j - axis[1]] = streaks[streak]
-                        elif left_node != turn and left_node != opponent and left_node < count:
-                            if count + (left_node % 2) > 6:
-                                heuristics[i - axis[0]][j - axis[1]] = count
-                            else:
-                                heuristics[i - axis[0]][j - axis[1]] = count + (left_node % 2)
-
-                    # Setting the heuristic value of the node that is adjacent to the streak from the right side
-                    if 0 <= i + row_change < size and 0 <= j + col_change < size:
-                        right_node = heuristics[i + row_change][j + col_change]
-                        if right_node != turn and right_node != opponent and right_node == 0:
-                            heuristics[i + row_change][j + col_change] = count
-                        elif right_node != turn and right_node != opponent and right_node < count:
-                            if count + (right_node % 2) > 6:
-                                heuristics[i + row_change][j + col_change] = count
-                            else:
-                                heuristics[i + row_change][j + col_change] = count + (right_node % 2)
+    # The stones of turn are found with bytearray.find, in row-major order
+    index = cells.find(turn)
+    while index >= 0:
+        i, j = divmod(index, size)
+        for axis in [(1, 0), (0, 1), (1, 1), (1, -1)]:                     # Four axes that we consider
+            count = 3                                                      # To count the streak
+            for k in range(1, 5):
+                row_change = k * axis[0]
+                col_change = k * axis[1]
+
+                if 0 <= i + row_change < size and 0 <= j + col_change < size:
+                    node = cells[(i + row_change) * size + j + col_change]
+                    if node == turn:
+                        count += 1
+                        continue
+                    break
+                break
+
+            # Setting the heuristic value of the node that is adjacent to the streak from the left side
+            if 0 <= i - axis[0] < size and 0 <= j - axis[1] < size:
+                left = (i - axis[0]) * size + j - axis[1]
+                left_node = heuristics[left]
+                if left_node != turn and left_node != opponent and left_node == 0:
+                    heuristics[left] = count
+                elif left_node != turn and left_node != opponent and 0 <= i - 2 * axis[0] < size and \
+                        0 <= j - 2 * axis[1] < size:
+                    if heuristics[(i - 2 * axis[0]) * size + j - 2 * axis[1]] == turn:
+                        streak = values[heuristics[left]] + values[count]
+                        if streak > 4:
+                            streak = 4
+                        heuristics[left] = streaks[streak]
+                elif left_node != turn and left_node != opponent and left_node < count:
+                    if count + (left_node % 2) > 6:
+                        heuristics[left] = count
+                    else:
+                        heuristics[left] = count + (left_node % 2)
+
+            # Setting the heuristic value of the node that is adjacent to the streak from the right side
+            if 0 <= i + row_change < size and 0 <= j + col_change < size:
+                right = (i + row_change) * size + j + col_change
+                right_node = heuristics[right]
+                if right_node != turn and right_node != opponent and right_node == 0:
+                    heuristics[right] = count
+                elif right_node != turn and right_node != opponent and right_node < count:
+                    if count + (right_node % 2) > 6:
+                        heuristics[right] = count
+                    else:
+                        heuristics[right] = count + (right_node % 2)
+        index = cells.find(turn, index + 1)
 
     score = 0
-    for i in range(size):
-        for j in range(size):
-            if heuristics[i][j] > 2:
-                score += heuristics[i][j]
-    return board, heuristics, score
+    for value in heuristics:
+        if value > 2:
+            score += value
+    return board, pente.FlatBoard(size, heuristics, 0), score
+
+
+def streak_grids(cells, turn):
+    """
+    calculate_streaks with NumPy, for one board or a batch of boards of the same size. Every empty cell takes the writes
+    of the stones around it in the order of WRITES, each of them on all cells at once, so the values are the same as
+    those of calculate_streaks. Like calculate_streaks, a five in a row can raise a KeyError
+    :param cells: an array of 0, 1 and 2 of shape (size, size), or (..., size, size) for a batch
+    :param turn: either 1 or 2, depending on if the 1st or 2nd player is wanting to place a piece
+    :return: the heuristics of every board as an array of the shape of cells, and the score of every board
+    """
+    if numpy is None:
+        raise ImportError('streak_grids needs NumPy')
+    cells = numpy.asarray(cells)
+    size = cells.shape[-1]
+    own = numpy.zeros(cells.shape[:-2] + (size + 2 * PAD, size + 2 * PAD), bool)
+    own[..., PAD:-PAD, PAD:-PAD] = cells == turn
+    inside = numpy.zeros((size + 2 * PAD, size + 2 * PAD), bool)
+    inside[PAD:-PAD, PAD:-PAD] = True
+    empty = cells == 0
+
+    def at(grid, row, col):
+        # The value of grid at the given offset from every cell
+        return grid[..., PAD + row:PAD + row + size, PAD + col:PAD + col + size]
+
+    # The empty cells with m stones of turn just before them along every axis
+    before = {}
+    for axis in AXES:
+        streak = empty
+        for m in range(1, 5):
+            streak = streak & at(own, -m * axis[0], -m * axis[1])
+            before[axis, m] = streak
+
+    # The empty cells the stones of turn write into, and the count they write, for every entry of WRITES
+    writes = []
+    for row, col, axis, m in WRITES:
+        if m > 0:
+            # The right side of a streak of m stones: the count of its first stone is 3 and the m - 1 stones after it
+            writes.append((before[axis, m], numpy.int8(m + 2), None))
+        else:
+            # The left side of the stone after the cell: 3 and the stones after that one, at most 4 of them
+            streak = at(own, 2 * row, 2 * col)
+            count = 3 + streak.astype(numpy.int8)
+            for k in range(3, 6):
+                streak = streak & at(own, k * row, k * col)
+                count += streak
+            writes.append((empty & at(own, row, col), count, (at(inside, -row, -col), at(own, -row, -col))))
+
+    heuristics = cells.astype(numpy.int8)
+    for write, count, behind in writes:
+        if not write.any():
+            continue
+        # A count of 0 is raised to count, a lower count to count and its last bit, or just count past 6
+        odd = heuristics & 1
+        raised = numpy.where(count + odd > 6, count, count + odd)
+        if behind is None:
+            heuristics = numpy.where(write & (heuristics < count), raised, heuristics)
+            continue
+        # With the cell before in the board, a stone of turn there joins the two streaks, and anything else leaves a
+        # value that is not 0 alone
+        inBoard, joining = behind
+        written = write & (heuristics != 0)
+        joined = written & joining
+        if (joined & ((heuristics == 7) | (count == 7))).any():
+            # values has no 7, the streak is a five in a row
+            raise KeyError(7)
+        kept = written & inBoard
+        heuristics = numpy.where(joined, numpy.minimum(heuristics + count - 4, 4) + 2,
+                                 numpy.where(write & ~kept & (heuristics < count), raised, heuristics))
+
+    score = numpy.where(heuristics > 2, heuristics, 0).sum(axis=(-2, -1), dtype=int)
+    return heuristics, score
+
+
+def verify_engines(count=200, size=19, seed=520):
+    """
+    Compare the 'python' and 'numpy' engines of calculate_streaks on random boards, one at a time and as one batch
+    :param count: the number of boards
+    :param size: the board size
+    :param seed: the seed the boards are made from
+    :return: a list of (board, turn) for which the engines do not agree, empty if they always do
+    """
+    if numpy is None:
+        raise ImportError('verify_engines needs NumPy, without it there is only the python engine')
+    rng = random.Random(seed)
+    boards = []
+    for b in range(count):
+        # From nearly empty to nearly full
+        fill = rng.random()
+        boards.append([[rng.choice((1, 2)) if rng.random() < fill else 0 for j in range(size)] for i in range(size)])
+    mismatches = []
+    for turn in (1, 2):
+        expected = []
+        for board in boards:
+            try:
+                expected.append(calculate_streaks(board, turn, 'python')[1:])
+            except KeyError:
+                expected.append(None)
+            try:
+                found = calculate_streaks(board, turn, 'numpy')[1:]
+            except KeyError:
+                found = None
+            if found != expected[-1]:
+                mismatches.append((board, turn))
+        # The batch raises if any of its boards does, so only the boards that do not are put in it
+        batch = [b for b in range(count) if expected[b] is not None]
+        if len(batch) > 0:
+            heuristics, scores = streak_grids(numpy.array([boards[b] for b in batch]), turn)
+            for k, b in enumerate(batch):
+                same = heuristics[k].tolist() == expected[b][0].rows() and int(scores[k]) == expected[b][1]
+                if not same and (boards[b], turn) not in mismatches:
+                    mismatches.append((boards[b], turn))
+    return mismatches
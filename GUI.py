@@ -2,6 +2,7 @@ import sys
 import pente
 import MCTS
 import ABpruning
+import TranspositionTable
 import copy
 from PyQt5 import QtCore
 from PyQt5.QtWidgets import (
@@ -17,6 +18,8 @@ class Window(QWidget):
         # self.setFixedSize(800, 800)
         self.turn = 1
         self.boardSize = 7
+        # Number of processes the alpha beta search is split between
+        self.workers = 1
         self.game = None
         self.captures = [0, 0]
         self.win = None
@@ -26,6 +29,7 @@ class Window(QWidget):
         self.topHorizontal = QHBoxLayout()
         self.grid = QGridLayout()
         self.sizeForm = QFormLayout()
+        self.workersForm = QFormLayout()
         self.algorithmsDropDown = QStackedLayout()
         self.heuristicsDropDown = QStackedLayout()
 
@@ -40,6 +44,17 @@ class Window(QWidget):
         self.setSizeButton.setText("OK")
         self.setSizeButton.clicked.connect(self.set_size)
 
+        # A form to enter the number of alpha beta worker processes
+        self.workersWidget = QLineEdit()
+        self.workersWidget.setText(str(self.workers))
+        self.workersForm.addRow("Workers:", self.workersWidget)
+
+        # button to set the number of workers
+        self.setWorkersButton = QPushButton()
+        self.setWorkersButton.setFixedSize(QtCore.QSize(56, 28))
+        self.setWorkersButton.setText("OK")
+        self.setWorkersButton.clicked.connect(self.set_workers)
+
         # Dropdown definitions for algorithms and heuristics
         self.algorithms = QComboBox()
         self.heuristics = QComboBox()
@@ -60,6 +75,8 @@ class Window(QWidget):
         # Adding widgets to layouts
         self.topHorizontal.addLayout(self.sizeForm)
         self.topHorizontal.addWidget(self.setSizeButton)
+        self.topHorizontal.addLayout(self.workersForm)
+        self.topHorizontal.addWidget(self.setWorkersButton)
         self.topHorizontal.addLayout(self.algorithmsDropDown)
         self.topHorizontal.addLayout(self.heuristicsDropDown)
         self.mainLayout.addLayout(self.topHorizontal)
@@ -70,11 +87,14 @@ class Window(QWidget):
         self.setLayout(self.mainLayout)
 
         # Creating a pente board, MCTS objects, and AB objects
-        self.game = pente.make_board(self.boardSize)
+        self.game = pente.FlatBoard(self.boardSize)
         self.monteCarlo = MCTS.MCTS(self.boardSize)
         self.board = MCTS.Board(self.boardSize)
         self.abBoard = ABpruning.Board(self.boardSize)
         self.heuristicsNames = ["conP", "mcs", "mcp", "capP", "mom", "cpc", "mc", "cpp", "mp", "mcsp"]
+        self.abPool = ABpruning.ParallelSearch(self.workers) if self.workers > 1 else None
+        # The alpha beta transposition tables of the game, one for each heuristic since the scores depend on it
+        self.abTables = {}
         self.pos_inf = sys.maxsize
         self.neg_inf = -sys.maxsize
 
@@ -100,6 +120,16 @@ class Window(QWidget):
         self.boardSize = int(size)
         self.win_popup()                       # Calling this as this method does what we want for this scenario as well
 
+    def set_workers(self):
+        """
+        Restarts the alpha beta worker processes with the user entered number of workers. 1 searches in this process.
+        """
+        workers = max(1, int(self.workersWidget.text()))
+        if self.abPool is not None:
+            self.abPool.close()
+        self.workers = workers
+        self.abPool = ABpruning.ParallelSearch(self.workers) if self.workers > 1 else None
+
     def place_stone(self):
         """
         Placing a stone on the clicked cell.
@@ -117,7 +147,7 @@ class Window(QWidget):
 
         self.game, self.captures, win = pente.update_board(self.game, self.captures, 1, row, column)
         self.check_win(win)
-        self.updateBoard(self.game)
+        self.updateBoard(self.game.rows())
 
         if not self.popup.isVisible():
             algorithm = self.algorithms.currentText()
@@ -143,15 +173,23 @@ class Window(QWidget):
                 self.abBoard.captures = copy.deepcopy(self.captures)
                 ABpruning.numberOfHeuristic = heuristic + 1
                 # ABpruning.bigDepth = 4
-                value, result = ABpruning.minmax(0, self.abBoard, True, 2, self.neg_inf, self.pos_inf, self.boardSize)
-                move = result.moves[0]['move']
+                # ABpruning.timeLimit = 2
+                if heuristic not in self.abTables:
+                    self.abTables[heuristic] = TranspositionTable.TranspositionTable()
+                value, move = ABpruning.findNextMove(self.abBoard, 2, self.boardSize, self.abTables[heuristic],
+                                                     self.abPool)
+                if move is None:
+                    # The board is full, the game is a draw
+                    self.popup.setText("It's a draw!")
+                    self.popup.show()
+                    return
                 ai_row = move[0]
                 ai_column = move[1]
                 self.game, self.captures, win = pente.update_board(self.game, self.captures, 2, ai_row, ai_column)
                 self.check_win(win)
             else:
                 raise Exception("Invalid Algorithm")
-            self.updateBoard(self.game)
+            self.updateBoard(self.game.rows())
 
 
             ai_button_index = self.boardSize * ai_row + ai_column
@@ -196,12 +234,21 @@ class Window(QWidget):
         Runs when a user clicks on 'Retry' after game completion.
         """
         self.clear_layout(self.grid)
-        self.game = pente.make_board(self.boardSize)
+        self.game = pente.FlatBoard(self.boardSize)
         self.monteCarlo = MCTS.MCTS(self.boardSize)
         self.board = MCTS.Board(self.boardSize)
         self.abBoard = ABpruning.Board(self.boardSize)
+        self.abTables = {}
         self.create_grid(self.boardSize)
 
+    def closeEvent(self, event):
+        """
+        Stops the alpha beta worker processes when the window is closed.
+        """
+        if self.abPool is not None:
+            self.abPool.close()
+        event.accept()
+
     def clear_layout(self, layout):
         """
         Clears all elements from an already drawn layout.
@@ -1,24 +1,95 @@
 # main function for the Monte Carlo Tree Search
 # Refers to the MCTS tutorial: https://www.baeldung.com/java-monte-carlo-tree-search
 import math
+import multiprocessing
 import random
 import sys
 import copy
 import pente
+import ABpruning
 import ConsecutivePieces
 import CapturedPieces
+import Candidates
 import MidControl
 import Momentum
+import RolloutPolicy
+import SearchTree
+import TranspositionTable
+import Zobrist
 import time
+try:
+    import numpy
+except ImportError:
+    numpy = None
+try:
+    import resource
+except ImportError:
+    resource = None
 
+# findNextMove stops at the first of its budgets used up: timeout seconds, iterationBudget iterations, playoutBudget
+# playouts or nodeBudget nodes in the tree. None leaves a budget out. Without the time budget a search does the same
+# work on any machine, and with a seed given to MCTS it picks the same moves every time
 timeout = 1
+iterationBudget = None
+playoutBudget = None
+nodeBudget = None
+# The most nodes the tree may hold, or None. At the limit, limitAction 'prune' removes the subtrees of the least
+# visited nodes until pruneTarget of the limit is left, and 'stop' stops expanding and keeps playing out from the leaves
+# there are. The root is always expanded, so its children can take the tree past a limit smaller than them. A node
+# takes SearchTree.memory() / SearchTree.capacity bytes
+nodeLimit = None
+limitAction = 'prune'
+pruneTarget = 0.5
+# The exploration constant of UCT
+exploration = 1.41
+# Nodes with at least this many children are scored all at once with NumPy, when it is installed
+vectorChildren = 40
+# Whether every move of a playout also counts for the children with the same move higher up the path (RAVE). Their
+# all-moves-as-first score is blended into UCT with weight sqrt(raveEquivalence / (3 * visits + raveEquivalence)),
+# which goes down as the child itself is visited more often
+rave = False
+raveEquivalence = 300
+# Whether selection uses PUCT instead of UCT:
+# score / visits + puctConstant * prior * sqrt(parent visits) / (1 + visits).
+# The prior of a child is its share of the heuristic map of the parent, worked out once when the parent is expanded,
+# mixed with priorMix of an even share so no move is shut out
+priors = False
+puctConstant = 10
+priorMix = 0.1
+# Playouts stop after rolloutDepth moves, None plays them to the end. A playout stopped early counts as a win for player
+# 1 with the chance 1 / (1 + exp(-(e1 - e2) / evaluationScale)), e1 and e2 being the ABpruning.getHeu scores of both
+# players with the alpha beta heuristic of the same number
+rolloutDepth = None
+evaluationScale = 10
+alphaBetaHeuristics = {'conP': 1, 'capP': 2, 'mcp': 3, 'mcs': 4, 'mom': 5, 'cpc': 6, 'mc': 7, 'cpp': 8, 'mp': 9,
+                       'mcsp': 10}
+# Whether a node expanded at a position already expanded through another move order shares the children of that node
+# instead of adding its own, which makes the tree a DAG. The nodes are found by position key in a table of
+# transpositionEntries entries, which is cleared whenever the tree is pruned or reused
+transpositions = False
+transpositionEntries = 1 << 16
+# Only empty positions within this many rows and columns of a stone are expanded. None expands every empty position
+candidateRadius = 2
+# Whether findNextMove starts from the subtree under its last move and the opponent's reply, instead of a new tree
+reuseTree = True
+# Whether nodes open their children a few at a time, best heuristic value first, as they are visited more often
+# (progressive widening). A node visited n times has wideningConstant * (n + 1) ** wideningExponent children open
+progressiveWidening = False
+wideningConstant = 2
+wideningExponent = 0.5
+# The visits added to the path of a leaf waiting for its playout in a leaf parallel search, so the other leaves of the
+# batch are selected elsewhere (virtual loss)
+virtualLoss = 1
+# Whether playouts keep the heuristic maps up to date move by move with a RolloutPolicy, instead of working them out
+# again for every move. The moves played are the same either way
+fastRollouts = True
 
 class Board:
     """
     The Board class, hold the board status
     """
 
-    # The 2d array for board
+    # The FlatBoard holding the stones
     board = []
     # current status, 0 : in progress, 1 : player 1 win, 2: player 2 win
     status = 0
@@ -26,300 +97,514 @@ class Board:
     move = []
     # captures
     captures = [0, 0]
+    # Candidates kept up to date by performMove, makeMove and unmakeMove, or None
+    candidates = None
+    # RolloutPolicy kept up to date the same way, or None
+    policy = None
+    # Where the random moves of simulatePlay come from, a random.Random or the random module
+    rng = random
 
 
     def __init__(self, size, board=None):
-        self.board = pente.make_board(size)
         if board != None:
-            for i in range(len(board.board)):
-                for j in range(len(board.board[0])):
-                    self.board[i][j] = board.board[i][j]
+            self.board = board.board.copy()
+        else:
+            self.board = pente.FlatBoard(size)
+        self.captures = [0, 0]
+        # The MoveRecords of the moves made by makeMove
+        self.undo = []
 
     def getEmptyPositions(self):
         """
         Get all empty positons on the board
         :return: all empty positions with cols and rows
         """
+        size = self.board.size
         emptyPosition = []
-        for i in range(len(self.board)):
-            for j in range(len(self.board[i])):
-                if self.board[i][j] == 0:
-                    emptyPosition.append([i, j])
+        for index, cell in enumerate(self.board.cells):
+            if cell == 0:
+                emptyPosition.append([index // size, index % size])
         # print('empty', emptyPosition)
         return emptyPosition
 
+    def getCandidatePositions(self):
+        """
+        Get the positions worth expanding. These are the empty positions near a stone, unless candidateRadius is None
+        :return: the positions with cols and rows
+        """
+        if candidateRadius is None:
+            return self.getEmptyPositions()
+        if self.candidates is None:
+            self.candidates = Candidates.Candidates(self.board, candidateRadius)
+        return self.candidates.positions()
+
     def performMove(self, p, playerNo):
         """
         Call the pente game to perform a move
         :param p: the position of move that we want to perform
         :param playerNo: the player that perform the move, either 1 or 2
         """
-        captures = [0, 0]
-        # (game, captures, 1, 0, 6)
-        game, captures, win = pente.update_board(self.board, self.captures, playerNo, p[0], p[1])
-        # print('c', captures)
-        self.board = game
-        self.status = win
-        self.move = copy.deepcopy(p)
-        self.captures = captures
+        # The move is made in place, callers copy the board first if they need to keep it
+        record = pente.make_move(self.board, self.captures, playerNo, p[0], p[1], self.status)
+        self.status = record.win
+        self.move = p[:]
+        if self.candidates is not None:
+            self.candidates.apply(record)
+        if self.policy is not None:
+            self.policy.apply(record)
 
-    def printBoard(self):
+    def makeMove(self, index, playerNo):
         """
-        Print the current board for display purpose
+        Perform a move in place and remember how to take it back with unmakeMove
+        :param index: the flat index of the move
+        :param playerNo: the player that perform the move, either 1 or 2
         """
-        pente.print_board(self.board)
-
+        size = self.board.size
+        record = pente.make_move(self.board, self.captures, playerNo, index // size, index % size, self.status)
+        self.undo.append(record)
+        self.status = record.win
+        if self.candidates is not None:
+            self.candidates.apply(record)
+        if self.policy is not None:
+            self.policy.apply(record)
 
-class State:
-    """
-    The state class for holding current board, and other score information
-    """
-
-    # current player
-    playerNo = 0
-    # visit count of this state
-    visitCount = 0
-    # win score of this state
-    winScore = 0
+    def unmakeMove(self):
+        """
+        Take back the last move made by makeMove
+        """
+        record = self.undo.pop()
+        self.status = pente.unmake_move(self.board, self.captures, record)
+        if self.candidates is not None:
+            self.candidates.undo(record)
+        if self.policy is not None:
+            self.policy.undo(record)
 
-    def __init__(self, size, state=None):
-        self.board = Board(size)
-        self.size = size
-        if state is not None:
-            self.board = Board(state.board)
-            self.playerNo = state.playerNo
-            self.visitCount = state.visitCount
-            self.winScore = state.winScore
-            self.captures = copy.deepcopy(state.captures)
-
-    def addH(self, h1, h2):
-        # print(h1)
-        for i in range(len(h1)):
-            for j in range(len(h2)):
-                if h1[i][j] != 1 and h1[i][j] != 2:
-                    h1[i][j] = h1[i][j] + h2[i][j]
-        # print(h1)
-        return h1
-
-    def getAllPossibleStates(self):
-        """
-        Get all possible states based on the current board
-        :return: a list of possible states
-        """
-        # constructs a list of all possible states from current state
-        possibleStates = []
-        availablePosition = self.board.getEmptyPositions()
-        for p in availablePosition:
-            newState = State(self.size)
-            newState.board = Board(self.size, self.board)
-            newState.board.captures = copy.deepcopy(self.board.captures)
-            newState.playerNo = 3 - self.playerNo
-            newState.board.performMove(p, newState.playerNo)
-            possibleStates.append(newState)
-        return possibleStates
-
-    def simulatePlay(self, heur):
+    def heuristicMap(self, playerNo, heur):
         """
-        Simulate a play by referring to the heuristics
+        Get the heuristic map of the board
+        :param playerNo: the player to play
         :param heur: the heuristic function we want to use
-        :return:
+        :return: the heuristic value of every position, as a row-major list
         """
-        # print('------------', self.playerNo, 'captures: ', self.board.captures)
-        # self.board.printBoard()
         if heur == 'conP':
-            board, heuristics, score = ConsecutivePieces.calculate_streaks(self.board.board, self.playerNo)
+            board, heuristics, score = ConsecutivePieces.calculate_streaks(self.board, playerNo)
         if heur == 'mcs':
-            board, heuristics, score = MidControl.mid_control_streaks(self.board.board, self.playerNo)
+            board, heuristics, score = MidControl.mid_control_streaks(self.board, playerNo)
         if heur == 'mcp':
-            board, heuristics, score = MidControl.mid_control_pieces(self.board.board, self.playerNo)
+            board, heuristics, score = MidControl.mid_control_pieces(self.board, playerNo)
         if heur == 'capP':
-            board, heuristics, score = CapturedPieces.captured_pieces(self.board.board, self.board.captures, self.playerNo)
+            board, heuristics, score = CapturedPieces.captured_pieces(self.board, self.captures, playerNo)
         if heur == 'mom':
-            board, heuristics, score = Momentum.MCTS_momentum(self.board.board, self.playerNo)
+            board, heuristics, score = Momentum.MCTS_momentum(self.board, playerNo)
         if heur == 'cpc':
-            board, h1, score = ConsecutivePieces.calculate_streaks(self.board.board, self.playerNo)
-            board, h2, score = CapturedPieces.captured_pieces(self.board.board, self.board.captures, self.playerNo)
-            heuristics = self.addH(h1, h2)
+            board, h1, score = ConsecutivePieces.calculate_streaks(self.board, playerNo)
+            board, h2, score = CapturedPieces.captured_pieces(self.board, self.captures, playerNo)
+            heuristics = addH(h1, h2)
         if heur == 'mc':
-            board, h1, score = Momentum.MCTS_momentum(self.board.board, self.playerNo)
-            board, h2, score = CapturedPieces.captured_pieces(self.board.board, self.board.captures, self.playerNo)
-            heuristics = self.addH(h1, h2)
+            board, h1, score = Momentum.MCTS_momentum(self.board, playerNo)
+            board, h2, score = CapturedPieces.captured_pieces(self.board, self.captures, playerNo)
+            heuristics = addH(h1, h2)
         if heur == 'cpp':
-            board, h1, score = ConsecutivePieces.calculate_streaks(self.board.board, self.playerNo)
-            board, h2, score = MidControl.mid_control_pieces(self.board.board, self.playerNo)
-            heuristics = self.addH(h1, h2)
+            board, h1, score = ConsecutivePieces.calculate_streaks(self.board, playerNo)
+            board, h2, score = MidControl.mid_control_pieces(self.board, playerNo)
+            heuristics = addH(h1, h2)
         if heur == 'mp':
-            board, h1, score = Momentum.MCTS_momentum(self.board.board, self.playerNo)
-            board, h2, score = MidControl.mid_control_pieces(self.board.board, self.playerNo)
-            heuristics = self.addH(h1, h2)
+            board, h1, score = Momentum.MCTS_momentum(self.board, playerNo)
+            board, h2, score = MidControl.mid_control_pieces(self.board, playerNo)
+            heuristics = addH(h1, h2)
         if heur == 'mcsp':
-            board, h1, score = MidControl.mid_control_streaks(self.board.board, self.playerNo)
-            board, h2, score = MidControl.mid_control_pieces(self.board.board, self.playerNo)
-            heuristics = self.addH(h1, h2)
+            board, h1, score = MidControl.mid_control_streaks(self.board, playerNo)
+            board, h2, score = MidControl.mid_control_pieces(self.board, playerNo)
+            heuristics = addH(h1, h2)
+        return rowMajor(heuristics)
 
-        maxnum = 0
-        maxnode = []
-        for i in range(len(heuristics)):
-            for j in range(len(heuristics[0])):
-                if heuristics[i][j] > maxnum and heuristics[i][j] != 1 and heuristics[i][j] != 2:
-                    maxnum = heuristics[i][j]
-                    maxnode = [i, j]
-        if len(maxnode) > 0:
-            self.board.performMove(maxnode, self.playerNo)
-        else:
-            availablePositions = self.board.getEmptyPositions()
-            if len(availablePositions) != 0:
-                selectRandom = random.randrange(len(availablePositions))
-                self.board.performMove(availablePositions[selectRandom], self.playerNo)
-
-
-    def togglePlayer(self):
+    def usePolicy(self, heur):
         """
-        Toggle the player
+        Keep a RolloutPolicy for the heuristic from now on, if fastRollouts is set and it supports the heuristic
+        :param heur: the heuristic function we want to use
         """
-        self.playerNo = 3 - self.playerNo
+        if self.policy is not None and self.policy.heur == heur:
+            return
+        self.policy = None
+        if fastRollouts and RolloutPolicy.supports(self.board.size, heur):
+            self.policy = RolloutPolicy.RolloutPolicy(self.board, heur)
 
-    def incrementVisit(self):
+    def heuristicValues(self, playerNo, heur):
         """
-        Increase the visit count
+        Get the heuristic value of every position, as heuristicMap has them for the empty positions. They come from the
+        RolloutPolicy when there is one for the heuristic
+        :param playerNo: the player to play
+        :param heur: the heuristic function we want to use
+        :return: the values as a flat list
         """
-        self.visitCount += 1
+        if self.policy is not None and self.policy.heur == heur:
+            return self.policy.scores(playerNo)
+        return self.heuristicMap(playerNo, heur)
 
-    def getOpponent(self):
+    def simulatePlay(self, playerNo, heur):
         """
-        Get the opponent of current player
-        :return: the opponent player
+        Simulate a play by referring to the heuristics
+        :param playerNo: the player to play
+        :param heur: the heuristic function we want to use
+        :return:
         """
-        return 3 - self.playerNo
+        # print('------------', playerNo, 'captures: ', self.captures)
+        # self.printBoard()
+        maxnode = []
+        if self.policy is not None and self.policy.heur == heur:
+            index = self.policy.choose(playerNo)
+            if index >= 0:
+                maxnode = [index // self.board.size, index % self.board.size]
+        else:
+            heuristics = self.heuristicMap(playerNo, heur)
+            size = self.board.size
 
-    def addScore(self, add):
+            maxnum = 0
+            for index, value in enumerate(heuristics):
+                if value > maxnum and value != 1 and value != 2:
+                    maxnum = value
+                    maxnode = [index // size, index % size]
+        if len(maxnode) > 0:
+            self.performMove(maxnode, playerNo)
+        else:
+            availablePositions = self.getEmptyPositions()
+            if len(availablePositions) != 0:
+                selectRandom = self.rng.randrange(len(availablePositions))
+                self.performMove(availablePositions[selectRandom], playerNo)
+
+    def printBoard(self):
         """
-        Add score to the win score
-        :param add: the added score
+        Print the current board for display purpose
         """
-        self.winScore += add
+        pente.print_board(self.board)
 
 
-class Node:
+def rowMajor(heuristics):
     """
-    The node class to hold the state
+    :param heuristics: a map of heuristic values, a FlatBoard, a list of rows or already a row-major list
+    :return: the values as a row-major list
     """
+    if isinstance(heuristics, pente.FlatBoard):
+        return list(heuristics.cells)
+    if len(heuristics) > 0 and isinstance(heuristics[0], list):
+        return [value for row in heuristics for value in row]
+    return heuristics
 
-    # The parent of this node
-    parent = None
-    # Children of this node
-    childArray = []
-
-    def __init__(self, size, node=None):
-        self.state = State(size)
-        if node is not None:
-            self.state = copy.deepcopy(node.state)
-            self.parent = copy.deepcopy(node.parent)
-            self.childArray = copy.deepcopy(node.childArray)
-
-    def getRandomChildNode(self):
-        """
-        Get a random child node
-        :return: a random child node of current node
-        """
-        selectRandom = random.randrange(len(self.childArray))
-        return self.childArray[selectRandom]
-
-    def printNode(self):
-        """
-        Pint a node, for debug purpose
-        """
-        self.state.board.printBoard()
-        print('child', len(self.childArray))
 
-    def getChildWithMaxScore(self):
-        """
-        Get the child of the max visit count of current node
-        :return: child of the max visit count
-        """
-        children = []
-        for c in self.childArray:
-            # print('child', c.state.board.board)
-            children.append({'count': c.state.visitCount, 'n': c})
-        children = sorted(children, key=lambda d: d['count'], reverse=True)
-        return children[0]['n']
+def addH(h1, h2):
+    # Add the values of h2 to the empty positions of h1, as a row-major list
+    return [a if a == 1 or a == 2 else a + b for a, b in zip(rowMajor(h1), rowMajor(h2))]
 
 
 class MCTS:
     """
-    The MCTS class
+    The MCTS class. The tree is a SearchTree, and the board of a node is made by playing the moves from the root on one
+    working board, which are taken back after the playout
+
+    :param size: the board size
+    :param workers: the number of processes. With more than one, findNextMove runs that many independent searches with
+    different seeds in a pool of worker processes and adds up their root statistics (root parallel search). The pool
+    lives as long as the MCTS, call close when done with it
+    :param leafBatch: with more than one worker and leafBatch above 0, there is one tree instead. Every iteration
+    selects leafBatch leaves using virtual loss and plays them out in the worker processes (leaf parallel search)
+    :param seed: the seed of the random numbers of this MCTS. None draws them from the random module
     """
     # The opponent
     opponent = 0
     # board size
     size = 7
 
-    def __init__(self, size):
+    def __init__(self, size, workers=1, leafBatch=0, seed=None):
         self.size = size
-        self.root = Node(self.size)
+        self.random = random.Random(seed) if seed is not None else random
+        self.workers = workers
+        self.leafBatch = leafBatch
+        self.pool = multiprocessing.Pool(workers) if workers > 1 else None
+        self.tree = SearchTree.SearchTree()
+        # The working board, at the root position between iterations
+        self.board = Board(size)
+        # (node, board cells, captures, player, heuristic) of the move played by the last findNextMove, or None
+        self.played = None
+        # The visits of the root taken over from the last search, and the iterations and playouts of this search
+        self.inheritedVisits = 0
+        self.iterations = 0
+        self.playouts = 0
+        # The visits and win score of every root move, added up over the trees of the last root parallel search
+        self.rootStats = None
+        # The nodes removed to stay under nodeLimit in the last search
+        self.pruned = 0
+        # The nodes from the root down to the last leaf selected
+        self.path = []
+        # The NodeTable of the last search with transpositions, or None
+        self.table = None
 
     def selectPromisingNode(self, rootNode):
         """
-        Get the best leaf with the best UCT score
+        Get the best leaf with the best UCT score, and play the moves down to it on the working board
         :param rootNode: the root node
         :return: the best leaf node
         """
+        tree = self.tree
         node = rootNode
-        # print('rt - pr', node.state.board.board)
-        # print('rt - pr', len(node.childArray))
-        #
-        while len(node.childArray) != 0:
-            # print('count', len(node.childArray))
-            node = bestUCT(node)
+        self.path = [node]
+        while tree.childCount[node] != 0:
+            if progressiveWidening:
+                tree.openCount[node] = min(tree.childCount[node], opened(tree.visits[node]))
+            node = bestUCT(tree, node)
+            self.board.makeMove(tree.move[node], tree.player[node])
+            self.path.append(node)
         return node
 
-    def expandNode(self, node):
+    def expandNode(self, node, heur):
         '''
-        Expand the current node with all possible states
+        Expand the current node with all possible moves on the working board
         :param node: Given node
+        :param heur: the heuristic function we want to use
         '''
-        possibleStates = node.state.getAllPossibleStates()
-        for state in possibleStates:
-            # print(state.board.board)
-            newNode = Node(self.size)
-            newNode.state = state
-            newNode.parent = node
-            newNode.state.playerNo = node.state.getOpponent()
-            newNode.childArray = []
-            node.childArray.append(newNode)
-
-    def backPropagation(self, nodeToExplore, playerNo):
+        size = self.size
+        playerNo = 3 - self.tree.player[node]
+        if transpositions:
+            key = Zobrist.position_key(self.board.board, self.board.captures, playerNo)
+            other = self.table.probe(key)
+            if other >= 0 and other != node and self.tree.childCount[other] > 0:
+                self.tree.share(node, other)
+                return
+        positions = self.board.getCandidatePositions()
+        if len(positions) == 0:
+            return
+        if nodeLimit is not None and self.tree.size + len(positions) > nodeLimit and self.tree.parent[node] >= 0:
+            # The tree is full, the node stays a leaf and is played out from. The root is expanded anyway, or there
+            # would be no move to pick
+            return
+        if transpositions:
+            self.table.store(key, node)
+        moves = [p[0] * size + p[1] for p in positions]
+        if not progressiveWidening and not priors:
+            self.tree.addChildren(node, moves, playerNo)
+            return
+        self.board.usePolicy(heur)
+        heuristics = self.board.heuristicValues(playerNo, heur)
+        openCount = None
+        if progressiveWidening:
+            # The children are stored best heuristic value first, since they are opened in that order
+            moves.sort(key=lambda m: -heuristics[m])
+            openCount = opened(self.tree.visits[node])
+        movePriors = None
+        if priors:
+            weights = [max(heuristics[m], 0) for m in moves]
+            total = sum(weights)
+            count = len(moves)
+            movePriors = [(1 - priorMix) * (w / total if total > 0 else 1.0 / count) + priorMix / count
+                          for w in weights]
+        self.tree.addChildren(node, moves, playerNo, openCount, movePriors)
+
+    def backPropagation(self, nodeToExplore, reward, moves=None, path=None):
         """
         Perform back propagation to add the value back to the nodes
         :param nodeToExplore: the node we explored
-        :param playerNo: current player
+        :param reward: the points of player 1 and 2 for the playout at index 1 and 2, from simulate
+        :param moves: the (flat index, player) of the moves of the playout, to add the all-moves-as-first statistics
+        with if rave is set
+        :param path: the nodes from the root down to nodeToExplore as selected. Without it the parent links are
+        followed, which only leads back the way the node was reached in a tree, not in a DAG
         """
-        tempNode = nodeToExplore
-        while tempNode is not None:
-            tempNode.state.incrementVisit()
-            if tempNode.state.playerNo == playerNo:
-                tempNode.state.addScore(10)
-            tempNode = tempNode.parent
+        tree = self.tree
+        if path is None:
+            path = lineage(tree, nodeToExplore)
+        if rave and moves is not None:
+            self.backPropagationRave(path, reward, moves)
+        for node in path:
+            tree.visits[node] += 1
+            tree.scores[node] += reward[tree.player[node]]
 
-    def simulatePlayout(self, node, heur):
+    def backPropagationRave(self, path, reward, moves):
+        """
+        Add the all-moves-as-first statistics of a playout. Going up the path, a child of a node is credited if its
+        player was the first to play its move after the node, further down the path or in the playout
+        :param path: the nodes from the root down to the node we explored
+        :param reward: the points of each player for the playout, from simulate
+        :param moves: the (flat index, player) of the moves of the playout
         """
-        Simulate the playout
+        tree = self.tree
+        # first[index] is the player who played index first after the current node, 0 if nobody did
+        first = bytearray(self.size * self.size)
+        for index, player in reversed(moves):
+            first[index] = player
+        for k in range(len(path) - 1, -1, -1):
+            node = path[k]
+            start = tree.firstChild[node]
+            count = tree.childCount[node]
+            if numpy is not None and 0 < count and vectorChildren <= count:
+                credited = numpy.frombuffer(first, numpy.int8)[childView(tree.move, start, count)] == \
+                    childView(tree.player, start, count)
+                childView(tree.raveVisits, start, count)[credited] += 1
+                childView(tree.raveScores, start, count)[credited] += \
+                    numpy.array(reward)[childView(tree.player, start, count)[credited]]
+            else:
+                for n in range(start, start + count):
+                    if first[tree.move[n]] == tree.player[n]:
+                        tree.raveVisits[n] += 1
+                        tree.raveScores[n] += reward[tree.player[n]]
+            if k > 0:
+                first[tree.move[node]] = tree.player[node]
+
+    def simulatePlayout(self, node, heur, moves=None):
+        """
+        Simulate the playout from the working board, which has to be at node
         :param node: the current node
         :param heur: the heurstic function
-        :return: the board status - which player win?
+        :param moves: a list to add the (flat index, player) of the moves of the playout to, if given
+        :return: the points of player 1 and 2 for the playout at index 1 and 2, from simulate
+        """
+        # Only the board is copied, the playout then plays its moves in place on that copy
+        tempBoard = Board(self.size, self.board)
+        tempBoard.captures = self.board.captures[:]
+        tempBoard.status = self.board.status
+        tempBoard.rng = self.random
+        if tempBoard.status == 0:
+            self.playouts += 1
+        # The working board keeps its RolloutPolicy up to date along the path, the playout starts from a copy. There is
+        # nothing to play when the game is over, and no heuristic map to work out
+        self.board.usePolicy(heur)
+        if self.board.policy is not None and tempBoard.status == 0:
+            tempBoard.policy = self.board.policy.copy(tempBoard.board)
+        return simulate(tempBoard, self.tree.player[node], heur, self.opponent, moves, rolloutDepth)
+
+    def selectLeaf(self, root, heur):
+        """
+        Select a promising node, expand it, and pick the node to play out from. The working board is left at that node
+        :param root: the root node
+        :param heur: the heuristic function we want to use
+        :return: the node to play out from
         """
-        tempNode = Node(self.size, node)
-        tempState = tempNode.state
-        boardStatus = tempState.board.status
-        if boardStatus == self.opponent:
-            tempNode.parent.state.winScore = sys.maxsize
-            return boardStatus
+        tree = self.tree
+        # Selection
+        promisingNode = self.selectPromisingNode(root)
+        # Expansion
+        if self.board.status == 0:
+            self.expandNode(promisingNode, heur)
+
+        nodeToExplore = promisingNode
+        if tree.childCount[promisingNode] > 0:
+            if progressiveWidening or priors:
+                nodeToExplore = bestUCT(tree, promisingNode)
+            else:
+                nodeToExplore = tree.firstChild[promisingNode] + self.random.randrange(tree.childCount[promisingNode])
+            self.board.makeMove(tree.move[nodeToExplore], tree.player[nodeToExplore])
+            self.path.append(nodeToExplore)
+        return nodeToExplore
 
-        while boardStatus == 0:
-            tempState.togglePlayer()
-            tempState.simulatePlay(heur)
-            boardStatus = tempState.board.status
-        return boardStatus
+    def playBatch(self, root, heur):
+        """
+        One iteration of a leaf parallel search. leafBatch leaves are selected, with virtual loss on the path of every
+        leaf until its playout is back, and the playouts run in the worker processes
+        :param root: the root node
+        :param heur: the heuristic function we want to use
+        """
+        tree = self.tree
+        tasks = []
+        leaves = []
+        paths = []
+        settings = workerSettings()
+        for k in range(self.leafBatch):
+            if k > 0 and self.budgetUsed():
+                break
+            nodeToExplore = self.selectLeaf(root, heur)
+            self.iterations += 1
+            if self.board.status != 0:
+                # The game is over at the leaf, there is nothing to play out
+                self.backPropagation(nodeToExplore, self.simulatePlayout(nodeToExplore, heur), [], self.path)
+            else:
+                for node in self.path:
+                    tree.visits[node] += virtualLoss
+                tasks.append((len(leaves), bytes(self.board.board.cells), tuple(self.board.captures),
+                              tree.player[nodeToExplore], heur, self.size, self.opponent,
+                              self.random.randrange(1 << 30), settings))
+                leaves.append(nodeToExplore)
+                paths.append(self.path)
+                self.playouts += 1
+            while len(self.board.undo) > 0:
+                self.board.unmakeMove()
+
+        # Back propagate every playout as soon as it is back
+        for k, reward, moves in self.pool.imap_unordered(_playout, tasks):
+            for node in paths[k]:
+                tree.visits[node] -= virtualLoss
+            self.backPropagation(leaves[k], reward, moves, paths[k])
+
+    def reuseSubtree(self, board, playerNo, heur):
+        """
+        Make the node of the opponent's reply to the last move played the root, keeping its subtree
+        :param board: the current board
+        :param playerNo: the current player
+        :param heur: the heuristic function we want to use
+        :return: the root, or -1 if the tree could not be reused
+        """
+        if self.played is None:
+            return -1
+        node, cells, captures, lastPlayer, lastHeur = self.played
+        self.played = None
+        # The statistics only hold for the same player and playouts
+        if lastPlayer != playerNo or lastHeur != heur:
+            return -1
+        tree = self.tree
+        size = self.size
+        first = tree.firstChild[node]
+        for child in range(first, first + tree.childCount[node]):
+            index = tree.move[child]
+            if board.board.cells[index] != 3 - playerNo:
+                continue
+            # Play the reply on the board the last search ended with, it has to give the current board
+            after = pente.FlatBoard(size, bytearray(cells))
+            afterCaptures = captures[:]
+            pente.make_move(after, afterCaptures, 3 - playerNo, index // size, index % size)
+            if after.cells == board.board.cells and afterCaptures == list(board.captures):
+                tree.keep(child)
+                return 0
+        return -1
+
+    def makeRoom(self, root):
+        """
+        With limitAction 'prune', prune the tree if the next iteration could take it past nodeLimit
+        :param root: the root node, which is node 0 afterwards
+        """
+        if nodeLimit is None or limitAction != 'prune':
+            return
+        # An iteration expands one node per leaf, with up to a child for every cell
+        room = self.size * self.size * (self.leafBatch if self.pool is not None else 1)
+        if self.tree.size + room > nodeLimit:
+            self.pruned += self.tree.prune(root, int(nodeLimit * pruneTarget))
+            # The nodes have moved
+            if self.table is not None:
+                self.table.clear()
+
+    def budgetUsed(self):
+        """
+        :return: whether the iteration, playout or node budget of the search is used up
+        """
+        return (iterationBudget is not None and self.iterations >= iterationBudget
+                or playoutBudget is not None and self.playouts >= playoutBudget
+                or nodeBudget is not None and self.tree.size >= nodeBudget)
+
+    def stats(self):
+        """
+        :return: a dictionary with the iterations and playouts of the last search, the visits it took over from the one
+        before, the size of the tree, the nodes pruned from it, the bytes its arrays hold, the peak resident memory of
+        the process in bytes (None where the resource module is missing), and with transpositions the hits and hit rate
+        of the node table
+        """
+        table = self.table.stats() if transpositions and self.table is not None else None
+        return {
+            'iterations': self.iterations,
+            'playouts': self.playouts,
+            'inheritedVisits': self.inheritedVisits,
+            'nodes': self.tree.size,
+            'prunedNodes': self.pruned,
+            'treeBytes': self.tree.memory(),
+            'peakRSS': peakMemory(),
+            'transpositionHits': table['hits'] if table is not None else None,
+            'transpositionHitRate': table['hitRate'] if table is not None else None,
+        }
 
     def findNextMove(self, board, playerNo, heur):
         """
@@ -330,74 +615,380 @@ class MCTS:
         :return: the next estimated best move
         """
         # print('input', board.board)
+        if self.pool is not None and self.leafBatch == 0:
+            return self.findNextMoveParallel(board, playerNo, heur)
         self.opponent = 3 - playerNo
-        # print(playerNo, 'select?', board.board)
-        self.root = Node(self.size)
-        self.root.childArray = []
-        self.root.state.board = copy.deepcopy(board)
-        self.root.state.playerNo = self.opponent
-
+        tree = self.tree
+        root = self.reuseSubtree(board, playerNo, heur) if reuseTree else -1
+        if root < 0:
+            root = tree.addRoot(self.opponent)
+        self.inheritedVisits = tree.visits[root]
+        self.iterations = 0
+        self.playouts = 0
+        self.pruned = 0
+        tree.limit = nodeLimit
+        # Reusing the tree moves its nodes, so the positions of the last search are not kept
+        self.table = TranspositionTable.NodeTable(transpositionEntries) if transpositions else None
+        self.board = Board(self.size, board)
+        self.board.captures = board.captures[:]
+        self.board.status = board.status
 
+        if timeout is None and iterationBudget is None and playoutBudget is None and nodeBudget is None:
+            raise ValueError('MCTS needs a time, iteration, playout or node budget')
         timeout_start = time.time()
-        while time.time() < timeout_start + timeout:
-            # print('simulation ', i)
-            # Selection
-            promisingNode = self.selectPromisingNode(self.root)
-            # print('promising', promisingNode.state.board.board)
-            # Expansion
-            if promisingNode.state.board.status == 0:
-                self.expandNode(promisingNode)
-
-            # print('node')
-            # promisingNode.childArray[0].printNode()
+        while (timeout is None or time.time() < timeout_start + timeout) and not self.budgetUsed():
+            self.makeRoom(root)
+            if self.pool is not None:
+                self.playBatch(root, heur)
+                continue
+            self.iterations += 1
+            # Selection and expansion
+            nodeToExplore = self.selectLeaf(root, heur)
             # Simulation
-            nodeToExplore = promisingNode
-            if len(promisingNode.childArray) > 0:
-                nodeToExplore = promisingNode.getRandomChildNode()
-
-            playoutResult = self.simulatePlayout(nodeToExplore, heur)
+            moves = [] if rave else None
+            reward = self.simulatePlayout(nodeToExplore, heur, moves)
             # Update
-            self.backPropagation(nodeToExplore, playoutResult)
-            # print('end', nodeToExplore)
-            # print('end', nodeToExplore.childArray[0].childArray)
+            self.backPropagation(nodeToExplore, reward, moves, self.path)
+            # Back to the root position
+            while len(self.board.undo) > 0:
+                self.board.unmakeMove()
 
-        winnerNode = self.root.getChildWithMaxScore()
-        # print('root', self.root.state.board.board)
-        # print('cd', self.root.childArray[0].state.board.board)
-        # print('win', winnerNode.state.board.board)
-        # self.root = winnerNode
-        return winnerNode.state.board.move, winnerNode.state.board
+        winnerNode = getChildWithMaxScore(tree, root)
+        move = [tree.move[winnerNode] // self.size, tree.move[winnerNode] % self.size]
+        winnerBoard = Board(self.size, self.board)
+        winnerBoard.captures = self.board.captures[:]
+        winnerBoard.status = self.board.status
+        winnerBoard.performMove(move, playerNo)
+        self.played = (winnerNode, bytes(winnerBoard.board.cells), winnerBoard.captures[:], playerNo, heur)
+        return move, winnerBoard
 
+    def findNextMoveParallel(self, board, playerNo, heur):
+        """
+        findNextMove for a root parallel search. Every worker searches its own tree for timeout seconds, with its share
+        of the iteration, playout and node budgets, and the move with the most visits over all the trees is played
+        :param board: the current board
+        :param playerNo: the current player
+        :param heur: the heuristic function we want to use
+        :return: the next estimated best move
+        """
+        cells = bytes(board.board.cells)
+        seed = self.random.randrange(1 << 30)
+        tasks = []
+        for i in range(self.workers):
+            tasks.append((cells, tuple(board.captures), board.status, playerNo, heur, self.size, seed + i,
+                          workerSettings(self.workers, i)))
+        # Moves are kept in the order they were first seen, which decides between moves with as many visits
+        totals = {}
+        self.iterations = 0
+        self.playouts = 0
+        self.pruned = 0
+        self.inheritedVisits = 0
+        for children, iterations, playouts, pruned in self.pool.map(_searchRoot, tasks, 1):
+            self.iterations += iterations
+            self.playouts += playouts
+            self.pruned += pruned
+            for index, visits, score in children:
+                if index not in totals:
+                    totals[index] = [0, 0.0]
+                totals[index][0] += visits
+                totals[index][1] += score
+        self.rootStats = totals
+
+        best = -1
+        for index in totals:
+            if best < 0 or totals[index][0] > totals[best][0]:
+                best = index
+        move = [best // self.size, best % self.size]
+        winnerBoard = Board(self.size, board)
+        winnerBoard.captures = board.captures[:]
+        winnerBoard.status = board.status
+        winnerBoard.performMove(move, playerNo)
+        return move, winnerBoard
 
-def bestUCT(node):
+    def close(self):
+        """
+        Stop the worker processes, if there are any
+        """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+
+def bestUCT(tree, node):
     '''
     Return the node with the best UCT value in given node's children
-    UCT:
+    UCT: score / visits + exploration * sqrt(log(parent visits) / visits), with 0 visits counted as 1. With rave,
+    score / visits is blended with the all-moves-as-first score. With priors, the PUCT exploration term is used instead
+    :param tree: the SearchTree
     :param node: Given Node
     :return: The node with the best UCT value in given node's children
     '''
-    totalVisit = node.state.visitCount
-    uctlist = []
-    for n in node.childArray:
-        nodeVisit = n.state.visitCount
-        nodeWinScore = n.state.winScore
+    totalVisit = tree.visits[node]
+    if totalVisit == 0:
+        totalVisit = 1
+    logTotal = math.log(totalVisit)
+    first = tree.firstChild[node]
+    count = tree.openCount[node]
+    if numpy is not None and count >= vectorChildren:
+        # The same sums as below, on views of the child statistics, so the same child is picked
+        visits = childView(tree.visits, first, count)
+        nodeVisits = numpy.maximum(visits, 1)
+        value = childView(tree.scores, first, count) / nodeVisits
+        if rave:
+            raveVisits = childView(tree.raveVisits, first, count)
+            amaf = childView(tree.raveScores, first, count) / numpy.maximum(raveVisits, 1)
+            beta = numpy.sqrt(raveEquivalence / (3 * visits + raveEquivalence))
+            value = (1 - beta) * value + beta * amaf
+        if priors:
+            uct = value + puctConstant * childView(tree.prior, first, count) * (math.sqrt(totalVisit) / (1 + visits))
+        else:
+            uct = value + exploration * numpy.sqrt(logTotal / nodeVisits)
+        return first + int(numpy.argmax(uct))
+    visits = tree.visits
+    scores = tree.scores
+    best = -1
+    bestUct = 0
+    for n in range(first, first + count):
+        nodeVisit = visits[n]
         if nodeVisit == 0:
             nodeVisit = 1
-        if totalVisit == 0:
-            totalVisit = 1
-        # print('log', nodeVisit, totalVisit)
-        uct = (nodeWinScore / nodeVisit) + 1.41 * math.sqrt(math.log(totalVisit) / nodeVisit)
-        uctlist.append({'uct': uct, 'node': n})
-    uctlist = sorted(uctlist, key=lambda d: d['uct'], reverse=True)
-    return uctlist[0]['node']
+        value = scores[n] / nodeVisit
+        if rave:
+            raveVisit = tree.raveVisits[n]
+            if raveVisit == 0:
+                raveVisit = 1
+            beta = math.sqrt(raveEquivalence / (3 * visits[n] + raveEquivalence))
+            value = (1 - beta) * value + beta * (tree.raveScores[n] / raveVisit)
+        if priors:
+            uct = value + puctConstant * tree.prior[n] * (math.sqrt(totalVisit) / (1 + visits[n]))
+        else:
+            uct = value + exploration * math.sqrt(logTotal / nodeVisit)
+        # The first of the children with the best value is taken
+        if best < 0 or uct > bestUct:
+            best = n
+            bestUct = uct
+    return best
 
 
-def performGame(heur1, heur2, boardSize):
-    # performGame between two heuristics
+def simulate(board, playerNo, heur, opponent, moves=None, depth=None):
+    """
+    Play a game out with the heuristic, in place on board
+    :param board: the Board to play on
+    :param playerNo: the player who made the last move
+    :param heur: the heuristic function we want to use
+    :param opponent: the opponent of the player the search is for
+    :param moves: a list to add the (flat index, player) of the moves played to, if given
+    :param depth: the number of moves to stop after, None plays to the end
+    :return: the points of player 1 and 2 at index 1 and 2: from points for the winner, or from chancePoints for the
+    winChance of a playout stopped after depth moves
+    """
+    boardStatus = board.status
+    if boardStatus == opponent:
+        return points(boardStatus)
+
+    played = 0
+    while boardStatus == 0:
+        if 0 not in board.board.cells:
+            # The board is full and nobody has won, so the playout is a draw
+            return points(0)
+        if depth is not None and played >= depth:
+            return chancePoints(winChance(board, heur))
+        played += 1
+        playerNo = 3 - playerNo
+        board.simulatePlay(playerNo, heur)
+        if moves is not None:
+            moves.append((board.move[0] * board.board.size + board.move[1], playerNo))
+        boardStatus = board.status
+    return points(boardStatus)
+
 
-    game = pente.make_board(boardSize)
+def winChance(board, heur):
+    """
+    Estimate the chance that player 1 wins from the ABpruning evaluation of the position for both players
+    :param board: the Board
+    :param heur: the MCTS heuristic, the alpha beta heuristic of the same number is used
+    :return: a float from 0 to 1
+    """
+    heuristic = alphaBetaHeuristics[heur]
+    one = ABpruning.getHeu(board.board, 1, board.captures, heuristic)[2]
+    two = ABpruning.getHeu(board.board, 2, board.captures, heuristic)[2]
+    # Kept within range of math.exp
+    x = max(-500.0, min(500.0, (one - two) / evaluationScale))
+    return 1.0 / (1.0 + math.exp(-x))
+
+
+def points(winner):
+    """
+    :param winner: the winner of a playout, 0 for a draw
+    :return: the score for player 1 and 2 at index 1 and 2, 10 for a win
+    """
+    reward = [0, 0, 0]
+    if winner != 0:
+        reward[winner] = 10
+    return reward
+
+
+def chancePoints(chance):
+    """
+    :param chance: the chance that player 1 wins
+    :return: the score for player 1 and 2 at index 1 and 2, 10 times the chance of each to win
+    """
+    return [0, 10 * chance, 10 * (1 - chance)]
+
+
+def workerSettings(workers=1, i=0):
+    """
+    :param workers: the number of searches the budgets are shared by
+    :param i: the number of a search
+    :return: the module settings for a worker process, with the share of the budgets of search i: (timeout,
+    iterationBudget, playoutBudget, nodeBudget, nodeLimit, limitAction, pruneTarget, candidateRadius,
+    progressiveWidening, wideningConstant, wideningExponent, fastRollouts, exploration, rave, raveEquivalence, priors,
+    puctConstant, priorMix, rolloutDepth, evaluationScale, transpositions, transpositionEntries)
+    """
+    return (timeout, share(iterationBudget, workers, i), share(playoutBudget, workers, i),
+            share(nodeBudget, workers, i), nodeLimit, limitAction, pruneTarget, candidateRadius, progressiveWidening,
+            wideningConstant, wideningExponent, fastRollouts, exploration, rave, raveEquivalence, priors, puctConstant,
+            priorMix, rolloutDepth, evaluationScale, transpositions, transpositionEntries)
+
+
+def _useSettings(settings):
+    """
+    Set the module settings of a worker process to those of the process that sent the task
+    :param settings: the settings, from workerSettings
+    """
+    global timeout, iterationBudget, playoutBudget, nodeBudget, nodeLimit, limitAction, pruneTarget, candidateRadius
+    global progressiveWidening, wideningConstant, wideningExponent, fastRollouts, exploration, rave, raveEquivalence
+    global priors, puctConstant, priorMix, rolloutDepth, evaluationScale, transpositions, transpositionEntries
+    (timeout, iterationBudget, playoutBudget, nodeBudget, nodeLimit, limitAction, pruneTarget, candidateRadius,
+     progressiveWidening, wideningConstant, wideningExponent, fastRollouts, exploration, rave, raveEquivalence, priors,
+     puctConstant, priorMix, rolloutDepth, evaluationScale, transpositions, transpositionEntries) = settings
+
+
+def _playout(task):
+    """
+    Run a playout of a leaf parallel MCTS, in a worker process
+    :param task: (number of the leaf in the batch, board cells, captures, player who made the last move, heuristic,
+    board size, opponent, seed, settings from workerSettings)
+    :return: the number of the leaf, the points of player 1 and 2 for the playout from simulate, and the (flat index,
+    player) of the moves played or None
+    """
+    k, cells, captures, playerNo, heur, size, opponent, seed, settings = task
+    _useSettings(settings)
+    board = Board(size)
+    board.rng = random.Random(seed)
+    board.board = pente.FlatBoard(size, bytearray(cells))
+    board.captures = list(captures)
+    board.usePolicy(heur)
+    moves = [] if rave else None
+    return k, simulate(board, playerNo, heur, opponent, moves, rolloutDepth), moves
+
+
+def _searchRoot(task):
+    """
+    Run one of the independent searches of a root parallel MCTS, in a worker process
+    :param task: (board cells, captures, status, player, heuristic, board size, seed, settings from workerSettings
+    with the share of the budgets of this search)
+    :return: a list of (move, visits, win score) for the children of the root, and the number of iterations, playouts
+    and pruned nodes
+    """
+    cells, captures, status, playerNo, heur, size, seed, settings = task
+    _useSettings(settings)
+    # A new MCTS for every task. An earlier task run by this process may have left a tree that reuseTree would take
+    # over, so the statistics would depend on which process the task went to
+    engine = MCTS(size, seed=seed)
+    board = Board(size)
+    board.board = pente.FlatBoard(size, bytearray(cells))
+    board.captures = list(captures)
+    board.status = status
+    engine.findNextMove(board, playerNo, heur)
+
+    tree = engine.tree
+    first = tree.firstChild[0]
+    children = [(tree.move[n], tree.visits[n], tree.scores[n]) for n in range(first, first + tree.childCount[0])]
+    return children, engine.iterations, engine.playouts, engine.pruned
+
+
+def peakMemory():
+    """
+    :return: the peak resident memory of the process in bytes, or None where the resource module is missing
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux gives kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def share(budget, workers, i):
+    """
+    :param budget: a budget, or None
+    :param workers: the number of workers it is shared by
+    :param i: the number of a worker
+    :return: the part of the budget for worker i, at least 1
+    """
+    if budget is None:
+        return None
+    return max(1, budget // workers + (1 if i < budget % workers else 0))
+
+
+def lineage(tree, node):
+    """
+    :param tree: the SearchTree
+    :param node: a node
+    :return: the nodes from the root down to node, following the parent links
+    """
+    nodes = []
+    while node >= 0:
+        nodes.append(node)
+        node = tree.parent[node]
+    nodes.reverse()
+    return nodes
+
+
+def opened(visits):
+    """
+    :param visits: the visits of a node
+    :return: how many children the node has open with progressive widening
+    """
+    return max(1, int(wideningConstant * (visits + 1) ** wideningExponent))
+
+
+def childView(values, first, count):
+    """
+    :param values: one of the arrays of a SearchTree
+    :param first: the first child
+    :param count: the number of children
+    :return: a NumPy view of the values of the children, without copying them. It has to be let go before the tree grows
+    """
+    return numpy.frombuffer(values, numpy.dtype(values.typecode), count, first * values.itemsize)
+
+
+def getChildWithMaxScore(tree, node):
+    """
+    Get the child of the max visit count of a node
+    :param tree: the SearchTree
+    :param node: the node
+    :return: the first child with the max visit count
+    """
+    visits = tree.visits
+    best = tree.firstChild[node]
+    if numpy is not None and 0 < tree.childCount[node] and vectorChildren <= tree.childCount[node]:
+        return best + int(numpy.argmax(childView(visits, best, tree.childCount[node])))
+    for n in range(best + 1, best + tree.childCount[node]):
+        if visits[n] > visits[best]:
+            best = n
+    return best
+
+
+def performGame(heur1, heur2, boardSize, workers=1):
+    # performGame between two heuristics, workers is the number of processes of each engine
+
+    game = pente.FlatBoard(boardSize)
     player = 1
-    mcts = MCTS(boardSize)
+    # One engine for each side, so each keeps its own tree between moves
+    mcts1 = MCTS(boardSize, workers)
+    mcts2 = MCTS(boardSize, workers)
     i = 0
     captures = [0, 0]
 
@@ -416,35 +1007,41 @@ def performGame(heur1, heur2, boardSize):
     board = Board(boardSize)
     board.board = game
 
-    while True:
-        # print(i)
-        i += 1
-        # print('player ', player)
-        if i % 2 != 0:
-            move, board = mcts.findNextMove(board, player, heur1)
-        else:
-            move, board = mcts.findNextMove(board, player, heur2)
-        # board.printBoard()
-        # print('move', move)
-        game, captures, win = pente.update_board(game, captures, player, move[0], move[1])
-        # print('captures', captures)
-        # pente.print_board(game)
-        # board, heuristics, score = AdjacentPieces.calculate_heuristic(game, 3 - player)
-        # print('sc', heuristics)
-        if win != 0:
-            # print(win, "win!!!!!")
-            return win
-        player = 3 - player
-        board = Board(boardSize)
-        board.board = game
-        board.captures = copy.deepcopy(captures)
+    try:
+        while True:
+            # print(i)
+            i += 1
+            # print('player ', player)
+            if i % 2 != 0:
+                move, board = mcts1.findNextMove(board, player, heur1)
+            else:
+                move, board = mcts2.findNextMove(board, player, heur2)
+            # board.printBoard()
+            # print('move', move)
+            game, captures, win = pente.update_board(game, captures, player, move[0], move[1])
+            # print('captures', captures)
+            # pente.print_board(game)
+            # board, heuristics, score = AdjacentPieces.calculate_heuristic(game, 3 - player)
+            # print('sc', heuristics)
+            if win != 0:
+                # print(win, "win!!!!!")
+                return win
+            player = 3 - player
+            board = Board(boardSize)
+            board.board = game
+            board.captures = copy.deepcopy(captures)
+    finally:
+        mcts1.close()
+        mcts2.close()
 
 def performGametest(heur1, heur2, boardSize):
     # performGame between two heuristics
 
-    game = pente.make_board(boardSize)
+    game = pente.FlatBoard(boardSize)
     player = 1
-    mcts = MCTS(boardSize)
+    # One engine for each side, so each keeps its own tree between moves
+    mcts1 = MCTS(boardSize)
+    mcts2 = MCTS(boardSize)
     i = 0
     captures = [0, 0]
 
@@ -468,9 +1065,9 @@ def performGametest(heur1, heur2, boardSize):
         i += 1
         print('player ', player)
         if i % 2 != 0:
-            move, board = mcts.findNextMove(board, player, heur1)
+            move, board = mcts1.findNextMove(board, player, heur1)
         else:
-            move, board = mcts.findNextMove(board, player, heur2)
+            move, board = mcts2.findNextMove(board, player, heur2)
         print('move', move)
         game, captures, win = pente.update_board(game, captures, player, move[0], move[1])
         print('captures', captures)
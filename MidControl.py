@@ -1,6 +1,6 @@
 import ConsecutivePieces as Cp
 import math
-import copy
+import pente
 
 
 def mid_control_streaks(board, turn):
@@ -11,26 +11,27 @@ def mid_control_streaks(board, turn):
     :param board: a Pente game board
     :param turn: either 1 or 2, depending on if the 1st or 2nd player is wanting to place a piece
 
-    :return: current board, board with heuristic values, and a score that is calculated based on the heuristic
+    :return: current board, board with heuristic values as a FlatBoard, and a score that is calculated based on the
+    heuristic
     """
     board, heuristics, score = Cp.calculate_streaks(board, turn)
-    size = len(board)
+    size = heuristics.size
 
     if size < 6:                                               # No point calculating this heuristic for smaller boards
         return board, heuristics, score
 
     mid = math.ceil(size / 2)                                  # Getting the middle point of the board
+    values = heuristics.cells                                  # Cell (i, j) is at i * size + j
 
     for i in range(mid - 3, mid + 2):
         for j in range(mid - 3, mid + 2):
-            if heuristics[i][j] > 2:                           # Doubling the score of the heuristic values that are in
-                heuristics[i][j] = 2 * heuristics[i][j]        # the middle of the board.
+            if values[i * size + j] > 2:                       # Doubling the score of the heuristic values that are in
+                values[i * size + j] *= 2                      # the middle of the board.
 
     score = 0
-    for i in range(size):
-        for j in range(size):
-            if heuristics[i][j] > 2:
-                score += heuristics[i][j]
+    for value in values:
+        if value > 2:
+            score += value
     return board, heuristics, score
 
 
@@ -45,45 +46,56 @@ def mid_control_pieces(board, turn):
     :param board: a Pente game board
     :param turn: either 1 or 2, depending on if the 1st or 2nd player is wanting to place a piece
 
-    :return: current board, board with heuristic values, and a score that is calculated based on the heuristic
+    :return: current board, board with heuristic values as a FlatBoard, and a score that is calculated based on the
+    heuristic
     """
-    size = len(board)
-    heuristics = copy.deepcopy(board)
+    flat = pente.to_flat(board)
+    size = flat.size
+    # The stones are read from the cells and the values written to a copy of them, cell (i, j) is at i * size + j
+    cells = flat.cells
+    heuristics = bytearray(cells)
     opponent = 2 if turn == 1 else 1                           # Getting the opponent
     mid = math.ceil(size / 2)                                  # Getting the middle point of the board
     score = 0
 
+    def at(i, j):
+        # The index of cell (i, j). On boards smaller than 5x5 the middle area starts at row and column -1, which wrap
+        # around like list indexes
+        return i % size * size + j % size
+
     # Calculating heuristics of the middle 5x5 area
     for i in range(mid - 3, mid + 2):
         for j in range(mid - 3, mid + 2):
-            if board[i][j] == turn:
+            node = cells[at(i, j)]
+            if node == turn:
                 score += 1
                 for axis in [(1, 0), (0, 1), (1, 1), (1, -1)]:                      # Four axes that we consider
                     if mid - 3 <= i - axis[0] < mid + 2 and mid - 3 <= j - axis[1] < mid + 2:
-                        node = board[i - axis[0]][j - axis[1]]
+                        node = cells[at(i - axis[0], j - axis[1])]
                         if node != turn and node != opponent:
-                            heuristics[i - axis[0]][j - axis[1]] = 6
+                            heuristics[at(i - axis[0], j - axis[1])] = 6
                     if mid - 3 <= i + axis[0] < mid + 2 and mid - 3 <= j + axis[1] < mid + 2:
-                        node = board[i + axis[0]][j + axis[1]]
+                        node = cells[at(i + axis[0], j + axis[1])]
                         if node != turn and node != opponent:
-                            heuristics[i + axis[0]][j + axis[1]] = 6
-            elif board[i][j] == opponent:
+                            heuristics[at(i + axis[0], j + axis[1])] = 6
+            elif node == opponent:
                 score -= 1
 
-    # Calculating heuristics of the rest of the board
-    for i in range(size):
-        for j in range(size):
-            if mid - 3 <= i < mid + 2 or mid - 3 <= j < mid + 2:
-                continue
-            if board[i][j] == turn:
-                for axis in [(1, 0), (0, 1), (1, 1), (1, -1)]:                      # Four axes that we consider
-                    if 0 <= i - axis[0] < size and 0 <= j - axis[1] < size:
-                        node = board[i - axis[0]][j - axis[1]]
-                        if node != turn and node != opponent:
-                            heuristics[i - axis[0]][j - axis[1]] = 3
-                    if 0 <= i + axis[0] < size and 0 <= j + axis[1] < size:
-                        node = board[i + axis[0]][j + axis[1]]
-                        if node != turn and node != opponent:
-                            heuristics[i + axis[0]][j + axis[1]] = 3
-
-    return board, heuristics, score
+    # Calculating heuristics of the rest of the board, going over the stones of turn with bytearray.find
+    index = cells.find(turn)
+    while index >= 0:
+        i, j = divmod(index, size)
+        index = cells.find(turn, index + 1)
+        if mid - 3 <= i < mid + 2 or mid - 3 <= j < mid + 2:
+            continue
+        for axis in [(1, 0), (0, 1), (1, 1), (1, -1)]:                              # Four axes that we consider
+            if 0 <= i - axis[0] < size and 0 <= j - axis[1] < size:
+                node = cells[(i - axis[0]) * size + j - axis[1]]
+                if node != turn and node != opponent:
+                    heuristics[(i - axis[0]) * size + j - axis[1]] = 3
+            if 0 <= i + axis[0] < size and 0 <= j + axis[1] < size:
+                node = cells[(i + axis[0]) * size + j + axis[1]]
+                if node != turn and node != opponent:
+                    heuristics[(i + axis[0]) * size + j + axis[1]] = 3
+
+    return board, pente.FlatBoard(size, heuristics, 0), score
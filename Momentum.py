@@ -1,3 +1,113 @@
+import pente
+
+
+XXXX_points = 10  # In effect, this score is 30 since having an unblocked 4 also means you have an unblocked 3
+XXX_points = 6
+X0X_points = 3
+
+AXES = [(1, 0), (0, 1), (1, 1), (1, -1)]
+# The value a cell off the board has in a window. The cells on the board keep their value, 0, 1 or 2
+EDGE = 3
+# A window is the cell behind a stone, the stone and the four cells in front of it along one axis. Its index has the
+# value of each cell as a base 4 digit, the cell behind being the highest
+WINDOW = 6
+
+
+def pattern_points(window, turn):
+    """
+    The points momentum_heuristic gives the stone of a window
+    :param window: the values of the cells of the window, EDGE for a cell off the board
+    :param turn: either 1 or 2, the player the points are for
+    :return: the points
+    """
+    behind, stone, f1, f2, f3, f4 = window
+    if stone != turn:
+        return 0
+    opp = 3 - turn
+    num_blocking = 1 if behind == opp or behind == EDGE else 0
+    if f1 == turn and f2 == turn and f3 == turn:
+        points = XXXX_points
+        if f4 == opp or f4 == EDGE:
+            num_blocking += 1
+    elif f1 == turn and f2 == turn:
+        points = XXX_points
+        if f3 == opp or f3 == EDGE:
+            num_blocking += 1
+    elif f1 != turn and f1 != EDGE and f2 == turn:
+        points = X0X_points
+        if f3 == opp or f3 == EDGE:
+            num_blocking += 1
+    else:
+        return 0
+
+    if num_blocking == 0:
+        return points
+    if num_blocking == 1:
+        return points / 2
+    return 0
+
+
+def make_patterns(turn):
+    """
+    :param turn: either 1 or 2
+    :return: the points of every window index for turn
+    """
+    patterns = []
+    for index in range(4 ** WINDOW):
+        window = [(index >> (2 * (WINDOW - 1 - k))) & 3 for k in range(WINDOW)]
+        patterns.append(pattern_points(window, turn))
+    return patterns
+
+
+# PATTERNS[turn][index] are the points of the window with that index for turn
+PATTERNS = [None, make_patterns(1), make_patterns(2)]
+
+# Per board size windows, built the first time a size is used
+_windows = {}
+
+
+def windows(size):
+    """
+    :param size: the board size
+    :return: for every flat index, the cells of its window along every axis, with size * size for a cell off the board
+    """
+    if size not in _windows:
+        edge = size * size
+
+        def cell(row, col):
+            return row * size + col if 0 <= row < size and 0 <= col < size else edge
+
+        table = []
+        for row in range(size):
+            for col in range(size):
+                table.append([tuple(cell(row + k * dr, col + k * dc) for k in range(-1, WINDOW - 1))
+                              for dr, dc in AXES])
+        _windows[size] = table
+    return _windows[size]
+
+
+def momentum_score(cells, size, turn):
+    """
+    The momentum_heuristic score of the stones of turn, looked up in PATTERNS window by window
+    :param cells: the row-major cells of the board, a bytearray or bytes
+    :param size: the board size
+    :param turn: either 1 or 2
+    :return: the score
+    """
+    patterns = PATTERNS[turn]
+    table = windows(size)
+    # One more cell, off the board, for the windows that go over the edge
+    cells = cells + bytes((EDGE,))
+    tot = 0
+    i = cells.find(turn)
+    while i >= 0:
+        for b, s, f1, f2, f3, f4 in table[i]:
+            tot += patterns[((((cells[b] * 4 + cells[s]) * 4 + cells[f1]) * 4 + cells[f2]) * 4 + cells[f3]) * 4 +
+                            cells[f4]]
+        i = cells.find(turn, i + 1)
+    return tot
+
+
 def momentum_heuristic(board, turn):
     """
     Uses the 'Momentum' method to work out the heuristic values.
@@ -6,79 +116,16 @@ def momentum_heuristic(board, turn):
     that the opponent must respond to or risk losing the game. If a pattern is only blocked on one end, half
     points are awarded when calculating the heuristic.
 
+    Every stone is scored along every axis by looking up its window in PATTERNS. The board edge blocks a pattern on
+    either side, negative indexes do not wrap around to the other side.
+
     :param board: a Pente game board
     :param turn: either 1 or 2, depending on if the 1st or 2nd player is wanting to place a piece
 
     :return: current board, heuristic score
     """
-    XXXX_points = 10  # In effect, this score is 30 since having an unblocked 4 also means you have an unblocked 3
-    XXX_points = 6
-    X0X_points = 3
-
-    opp = 3 - turn
-    tot = 0
-    for row in range(len(board)):
-        for column in range(len(board)):
-            if board[row][column] == turn:
-                for dir in [(1, 0), (0, 1), (1, 1), (1, -1)]:
-                    num_blocking = 0
-                    try:
-                        if board[row - (1 * dir[0])][column - (1 * dir[1])] == opp:
-                            num_blocking += 1
-                        elif row - (1 * dir[0]) < 0 or column - (1 * dir[1]) < 0:
-                            num_blocking += 1
-                    except IndexError:
-                        num_blocking += 1
-                    try:
-                        if (board[row + (1 * dir[0])][column + (1 * dir[1])] == turn and
-                                board[row + (2 * dir[0])][column + (2 * dir[1])] == turn and
-                                board[row + (3 * dir[0])][column + (3 * dir[1])] == turn):
-                            try:
-                                if board[row + (4 * dir[0])][column + (4 * dir[1])] == opp:
-                                    num_blocking += 1
-                            except IndexError:
-                                num_blocking += 1
-
-                            if num_blocking == 0:
-                                tot += XXXX_points
-                            elif num_blocking == 1:
-                                tot += XXXX_points / 2
-                            continue
-                    except IndexError:
-                        pass
-                    try:
-                        if (board[row + (1 * dir[0])][column + (1 * dir[1])] == turn and
-                                board[row + (2 * dir[0])][column + (2 * dir[1])] == turn):
-                            try:
-                                if board[row + (3 * dir[0])][column + (3 * dir[1])] == opp:
-                                    num_blocking += 1
-                            except IndexError:
-                                num_blocking += 1
-
-                            if num_blocking == 0:
-                                tot += XXX_points
-                            elif num_blocking == 1:
-                                tot += XXX_points / 2
-                            continue
-                    except IndexError:
-                        continue
-                    try:
-                        if board[row + (2 * dir[0])][column + (2 * dir[1])] == turn:
-                            try:
-                                if board[row + (3 * dir[0])][column + (3 * dir[1])] == opp:
-                                    num_blocking += 1
-                            except IndexError:
-                                num_blocking += 1
-
-                            if num_blocking == 0:
-                                tot += X0X_points
-                            elif num_blocking == 1:
-                                tot += X0X_points / 2
-                            continue
-                    except IndexError:
-                        continue
-
-    return board, tot
+    flat = pente.to_flat(board)
+    return board, momentum_score(flat.cells, flat.size, turn)
 
 
 def MCTS_momentum(board, turn):
@@ -90,18 +137,22 @@ def MCTS_momentum(board, turn):
 
     :return: current board, board with heuristic values filled in, heuristic score
     """
+    flat = pente.to_flat(board)
+    size = flat.size
+    # A copy of the cells, every empty cell gets a stone in turn to score it
+    cells = bytearray(flat.cells)
     base = momentum_heuristic(board, turn)
 
     new_board = []
-    for i in range(len(board)):
+    for i in range(size):
         new_board.append([])
-        for j in range(len(board[0])):
-            if board[i][j] == 0:
-                board[i][j] = turn
-                new_board[i].append(momentum_heuristic(board, turn)[1])
-                board[i][j] = 0
+        for j in range(size):
+            if cells[i * size + j] == 0:
+                cells[i * size + j] = turn
+                new_board[i].append(momentum_score(cells, size, turn))
+                cells[i * size + j] = 0
             else:
-                new_board[i].append(board[i][j])
+                new_board[i].append(cells[i * size + j])
 
     return board, new_board, base
 
@@ -0,0 +1,521 @@
+import math
+
+# The heuristic maps that each MCTS heuristic adds up. S: ConsecutivePieces.calculate_streaks, D: the same doubled in
+# the middle 5x5 area (MidControl.mid_control_streaks), C: CapturedPieces.captured_pieces, M:
+# MidControl.mid_control_pieces, O: Momentum.MCTS_momentum
+HEURISTICS = {
+    'conP': 'S', 'mcs': 'D', 'mcp': 'M', 'capP': 'C', 'mom': 'O',
+    'cpc': 'SC', 'mc': 'OC', 'cpp': 'SM', 'mp': 'OM', 'mcsp': 'DM',
+}
+
+AXES = [(1, 0), (0, 1), (1, 1), (1, -1)]
+# The streak mappings of calculate_streaks
+VALUES = {6: 4, 5: 3, 4: 2, 3: 1, 0: 0}
+STREAKS = {4: 6, 3: 5, 2: 4, 1: 3, 0: 0}
+# The pattern points of momentum_heuristic
+XXXX_points = 10
+XXX_points = 6
+X0X_points = 3
+
+# The value of an occupied cell in a map, so it is never the greedy choice
+OCCUPIED = float('-inf')
+
+# Per board size Tables, built the first time they are used
+_tables = {}
+
+
+class Tables:
+    """
+    The cells every heuristic value of a board size depends on, worked out once per size
+
+    :param size: the board size
+    """
+
+    def __init__(self, size):
+        n = size * size
+        self.size = size
+
+        def inside(r, c):
+            return 0 <= r < size and 0 <= c < size
+
+        def cell(r, c):
+            # The flat index, -1 off the board
+            return r * size + c if inside(r, c) else -1
+
+        # back[a][c] are the cells behind c along axis a, forward[a][c] the cells in front, up to the board edge
+        self.back = []
+        self.forward = []
+        for dr, dc in AXES:
+            back = []
+            forward = []
+            for c in range(n):
+                row, col = divmod(c, size)
+                back.append(tuple((row - k * dr) * size + col - k * dc for k in range(1, 5)
+                                  if inside(row - k * dr, col - k * dc)
+                                  and all(inside(row - m * dr, col - m * dc) for m in range(1, k))))
+                forward.append(tuple((row + k * dr) * size + col + k * dc for k in range(1, 6)
+                                     if inside(row + k * dr, col + k * dc)))
+            self.back.append(back)
+            self.forward.append(forward)
+
+        # The stones that write a streak value into a cell, in the order calculate_streaks goes over them (row-major).
+        # (a, d) is the stone d cells behind along axis a, (a, 0) the stone just in front
+        offsets = [dr * size + dc for dr, dc in AXES]
+        slots = [(-d * offsets[a], a, d) for a in range(4) for d in range(1, 5)]
+        slots += [(offsets[a], a, 0) for a in range(4)]
+        slots.sort()
+        self.slots = [(a, d) for delta, a, d in slots]
+
+        # streakNear[x] are the (axis, cell) whose streak writers can change when x changes
+        self.streakNear = []
+        for x in range(n):
+            row, col = divmod(x, size)
+            near = []
+            for a, (dr, dc) in enumerate(AXES):
+                for k in list(range(-5, 0)) + list(range(1, 5)):
+                    if inside(row + k * dr, col + k * dc):
+                        near.append((a, (row + k * dr) * size + col + k * dc))
+            self.streakNear.append(near)
+
+        # The middle 5x5 area and the corners outside the middle rows and columns, as in MidControl
+        mid = math.ceil(size / 2)
+        band = range(mid - 3, mid + 2)
+        self.middle = [divmod(c, size)[0] in band and divmod(c, size)[1] in band for c in range(n)]
+        self.corner = [divmod(c, size)[0] not in band and divmod(c, size)[1] not in band for c in range(n)]
+        # mid_control_streaks only doubles the middle on boards of at least 6x6
+        self.doubled = self.middle if size >= 6 else [False] * n
+        self.neighbours = []
+        for c in range(n):
+            row, col = divmod(c, size)
+            self.neighbours.append([(row + dr) * size + col + dc for dr in (-1, 0, 1) for dc in (-1, 0, 1)
+                                    if (dr != 0 or dc != 0) and inside(row + dr, col + dc)])
+
+        # captures[c] are the (opponent, opponent, own) cells from c in each direction that fits on the board
+        self.captures = []
+        self.captureNear = [set() for c in range(n)]
+        for c in range(n):
+            row, col = divmod(c, size)
+            lines = []
+            for dr in (-1, 0, 1):
+                for dc in (-1, 0, 1):
+                    if (dr != 0 or dc != 0) and inside(row + 3 * dr, col + 3 * dc):
+                        line = tuple((row + k * dr) * size + col + k * dc for k in range(1, 4))
+                        lines.append(line)
+                        for i in line:
+                            self.captureNear[i].add(c)
+            self.captures.append(lines)
+        self.captureNear = [list(near) for near in self.captureNear]
+
+        # momentum[p] for p = 4 * stone + axis are the cells of the Momentum window of that stone and axis: the stone,
+        # the cell behind and the four cells in front, -1 off the board
+        self.momentum = []
+        # momentumCells[p] are the distinct cells of momentum[p], momentumNear[x] the p that read x
+        self.momentumCells = []
+        self.momentumNear = [[] for c in range(n)]
+        for c in range(n):
+            row, col = divmod(c, size)
+            for a, (dr, dc) in enumerate(AXES):
+                deps = (c, cell(row - dr, col - dc)) + tuple(cell(row + k * dr, col + k * dc) for k in range(1, 5))
+                cells = []
+                for i in deps:
+                    if i >= 0 and i not in cells:
+                        cells.append(i)
+                        self.momentumNear[i].append(len(self.momentum))
+                self.momentum.append(deps)
+                self.momentumCells.append(tuple(cells))
+
+
+def tables(size):
+    """
+    :param size: the board size
+    :return: the Tables of the size
+    """
+    if size not in _tables:
+        _tables[size] = Tables(size)
+    return _tables[size]
+
+
+def supports(size, heur):
+    """
+    :param size: the board size
+    :param heur: the MCTS heuristic name
+    :return: whether RolloutPolicy plays like MCTS.Board.simulatePlay for the heuristic on this size
+    """
+    return heur in HEURISTICS and size >= 6
+
+
+def momentum(cells, turn, deps):
+    """
+    The points momentum_heuristic gives one stone along one axis
+    :param cells: the board cells
+    :param turn: the player
+    :param deps: the cells read, from Tables.momentum
+    :return: the points
+    """
+    s, behind, f1, f2, f3, f4 = deps
+    if cells[s] != turn:
+        return 0
+    opp = 3 - turn
+    blocking = 1 if behind < 0 or cells[behind] == opp else 0
+    if f1 < 0:
+        return 0
+    if cells[f1] == turn:
+        if f2 < 0 or cells[f2] != turn:
+            return 0
+        if f3 < 0:
+            points = XXX_points
+            blocking += 1
+        elif cells[f3] == turn:
+            points = XXXX_points
+            if f4 < 0 or cells[f4] == opp:
+                blocking += 1
+        else:
+            points = XXX_points
+            if cells[f3] == opp:
+                blocking += 1
+    else:
+        if f2 < 0 or cells[f2] != turn:
+            return 0
+        points = X0X_points
+        if f3 < 0 or cells[f3] == opp:
+            blocking += 1
+    if blocking == 0:
+        return points
+    if blocking == 1:
+        return points / 2
+    return 0
+
+
+class RolloutPolicy:
+    """
+    The heuristic-greedy move choice of MCTS.Board.simulatePlay, with the heuristic maps of both players kept up to date
+    as stones are placed and captured instead of being worked out from scratch for every move. Only the cells on the
+    lines through a changed cell are worked out again, and only when the map of that player is needed.
+
+    It picks exactly the moves simulatePlay picks: the first cell in row-major order with the highest value above 0.
+
+    :param board: the FlatBoard to follow. Its stones have to be changed through make_move and unmake_move, with every
+    MoveRecord passed to apply and undo
+    :param heur: the MCTS heuristic name, see HEURISTICS
+    :param source: an optional RolloutPolicy for a copy of board, to copy instead of working the maps out
+    """
+
+    def __init__(self, board, heur, source=None):
+        self.board = board
+        self.heur = heur
+        self.parts = HEURISTICS[heur]
+        self.tables = tables(board.size)
+        n = len(board.cells)
+        if source is not None:
+            self.built = source.built[:]
+            self.pending = [None, set(source.pending[1]), set(source.pending[2])]
+            self.values = [None] + [v[:] if v is not None else None for v in source.values[1:]]
+            self.base = source.base[:]
+            self.run = [None] + [[r[:] for r in x] if x is not None else None for x in source.run[1:]]
+            self.left = [None] + [[r[:] for r in x] if x is not None else None for x in source.left[1:]]
+            self.streaks = [None] + [x[:] if x is not None else None for x in source.streaks[1:]]
+            self.captures = [None] + [x[:] if x is not None else None for x in source.captures[1:]]
+            self.middle = [None] + [x[:] if x is not None else None for x in source.middle[1:]]
+            self.contributions = [None] + [x[:] if x is not None else None for x in source.contributions[1:]]
+            self.terms = [None] + [x[:] if x is not None else None for x in source.terms[1:]]
+            self.delta = [None] + [x[:] if x is not None else None for x in source.delta[1:]]
+            return
+
+        # Everything is indexed by player, the maps of a player are only made the first time they are needed
+        self.built = [False, False, False]
+        self.pending = [None, set(), set()]
+        # values[player][c] is the heuristic value of c, without the momentum total of the board
+        self.values = [None, None, None]
+        # The momentum total of the board
+        self.base = [0, 0, 0]
+        # run[player][a][c] is the number of the player's stones just behind c along axis a (up to 4), left[player][a][c]
+        # the streak count of the stone just in front of c (0 if there is none)
+        self.run = [None, None, None]
+        self.left = [None, None, None]
+        self.streaks = [None, None, None]
+        self.captures = [None, None, None]
+        self.middle = [None, None, None]
+        # The momentum points of every stone and axis, and for every cell they read, how much more they would be with
+        # a stone of the player there. delta[c] adds those up for c
+        self.contributions = [None, None, None]
+        self.terms = [None, None, None]
+        self.delta = [None, None, None]
+
+    def copy(self, board):
+        """
+        :param board: a copy of the board this follows
+        :return: a RolloutPolicy for the copied board, without working it out from scratch
+        """
+        # Bring both maps up to date first, so the work is not done again for every copy
+        self.refresh(1)
+        self.refresh(2)
+        return RolloutPolicy(board, self.heur, self)
+
+    def apply(self, record):
+        """
+        Update the maps after make_move
+        :param record: the MoveRecord returned by make_move
+        """
+        for pending in self.pending[1:]:
+            pending.add(record.index)
+            pending.update(record.removed)
+
+    def undo(self, record):
+        """
+        Update the maps after unmake_move
+        :param record: the MoveRecord that was taken back
+        """
+        self.apply(record)
+
+    def choose(self, turn):
+        """
+        :param turn: the player to move
+        :return: the flat index of the move simulatePlay would make, or -1 if no cell has a value above 0 and the move
+        has to be picked at random
+        """
+        self.refresh(turn)
+        values = self.values[turn]
+        best = max(values)
+        if best + self.base[turn] > 0:
+            return values.index(best)
+        return -1
+
+    def scores(self, turn):
+        """
+        :param turn: the player to move
+        :return: the heuristic value of every cell as a flat list, the values of the heuristic map for the empty cells
+        and OCCUPIED for the others
+        """
+        self.refresh(turn)
+        base = self.base[turn]
+        return [v + base for v in self.values[turn]]
+
+    def refresh(self, turn):
+        """
+        Bring the maps of a player up to date with the board
+        """
+        if not self.built[turn]:
+            self.build(turn)
+        elif len(self.pending[turn]) > 0:
+            self.update(turn)
+
+    def build(self, turn):
+        """
+        Work out the maps of a player from scratch
+        """
+        t = self.tables
+        cells = self.board.cells
+        n = len(cells)
+        parts = self.parts
+        if 'S' in parts or 'D' in parts:
+            self.run[turn] = [[self.backRun(turn, a, c) for c in range(n)] for a in range(4)]
+            self.left[turn] = [[self.leftCount(turn, a, c) for c in range(n)] for a in range(4)]
+            self.streaks[turn] = [self.streak(turn, c) for c in range(n)]
+        if 'C' in parts:
+            self.captures[turn] = [self.capture(turn, c) for c in range(n)]
+        if 'M' in parts:
+            self.middle[turn] = [self.middlePieces(turn, c) for c in range(n)]
+        if 'O' in parts:
+            self.contributions[turn] = [0] * len(t.momentum)
+            self.terms[turn] = [0] * (6 * len(t.momentum))
+            self.delta[turn] = [0] * n
+            self.base[turn] = 0
+            for p in range(len(t.momentum)):
+                self.updateMomentum(turn, p)
+        self.values[turn] = [self.value(turn, c) for c in range(n)]
+        self.pending[turn].clear()
+        self.built[turn] = True
+
+    def update(self, turn):
+        """
+        Work out the maps of a player again around the cells that changed since they were last needed
+        """
+        t = self.tables
+        parts = self.parts
+        changed = self.pending[turn]
+        touched = set(changed)
+        if 'S' in parts or 'D' in parts:
+            run = self.run[turn]
+            left = self.left[turn]
+            recount = set(changed)
+            for x in changed:
+                for a, c in t.streakNear[x]:
+                    r = self.backRun(turn, a, c)
+                    l = self.leftCount(turn, a, c)
+                    if r != run[a][c] or l != left[a][c]:
+                        run[a][c] = r
+                        left[a][c] = l
+                        recount.add(c)
+            streaks = self.streaks[turn]
+            for c in recount:
+                streaks[c] = self.streak(turn, c)
+            touched |= recount
+        if 'C' in parts:
+            captures = self.captures[turn]
+            near = set(changed)
+            for x in changed:
+                near.update(t.captureNear[x])
+            for c in near:
+                captures[c] = self.capture(turn, c)
+            touched |= near
+        if 'M' in parts:
+            middle = self.middle[turn]
+            near = set(changed)
+            for x in changed:
+                near.update(t.neighbours[x])
+            for c in near:
+                middle[c] = self.middlePieces(turn, c)
+            touched |= near
+        if 'O' in parts:
+            pairs = set()
+            for x in changed:
+                pairs.update(t.momentumNear[x])
+            for p in pairs:
+                touched.update(self.updateMomentum(turn, p))
+        values = self.values[turn]
+        for c in touched:
+            values[c] = self.value(turn, c)
+        changed.clear()
+
+    def value(self, turn, c):
+        """
+        :return: the heuristic value of c, without the momentum total of the board
+        """
+        if self.board.cells[c] != 0:
+            return OCCUPIED
+        v = 0
+        for part in self.parts:
+            if part == 'S':
+                v += self.streaks[turn][c]
+            elif part == 'D':
+                s = self.streaks[turn][c]
+                v += 2 * s if s > 2 and self.tables.doubled[c] else s
+            elif part == 'C':
+                v += self.captures[turn][c]
+            elif part == 'M':
+                v += self.middle[turn][c]
+            else:
+                v += self.delta[turn][c]
+        return v
+
+    def backRun(self, turn, a, c):
+        """
+        :return: the number of the player's stones just behind c along axis a, up to 4
+        """
+        cells = self.board.cells
+        n = 0
+        for i in self.tables.back[a][c]:
+            if cells[i] != turn:
+                break
+            n += 1
+        return n
+
+    def leftCount(self, turn, a, c):
+        """
+        :return: the streak count calculate_streaks works out for the stone just in front of c along axis a, or 0 if
+        there is no stone of the player there
+        """
+        cells = self.board.cells
+        forward = self.tables.forward[a][c]
+        if len(forward) == 0 or cells[forward[0]] != turn:
+            return 0
+        count = 3
+        for i in forward[1:]:
+            if cells[i] != turn:
+                break
+            count += 1
+        return count
+
+    def streak(self, turn, c):
+        """
+        :return: the value calculate_streaks gives c, going over the stones that write it in the same order
+        """
+        if self.board.cells[c] != 0:
+            return 0
+        run = self.run[turn]
+        left = self.left[turn]
+        back = self.tables.back
+        v = 0
+        for a, d in self.tables.slots:
+            if d > 0:
+                # The stone d cells behind, its streak ends at c
+                if d > run[a][c]:
+                    continue
+                count = d + 2
+                if v == 0:
+                    v = count
+                elif v < count:
+                    v = count + v % 2 if count + v % 2 <= 6 else count
+            else:
+                # The stone just in front, c is on its left side
+                count = left[a][c]
+                if count == 0:
+                    continue
+                if v == 0:
+                    v = count
+                elif len(back[a][c]) > 0:
+                    if run[a][c] > 0:
+                        streak = VALUES[v] + VALUES[count]
+                        v = STREAKS[4 if streak > 4 else streak]
+                elif v < count:
+                    v = count + v % 2 if count + v % 2 <= 6 else count
+        return v
+
+    def capture(self, turn, c):
+        """
+        :return: the value captured_pieces gives c, 3 if a stone there captures
+        """
+        cells = self.board.cells
+        if cells[c] != 0:
+            return 0
+        opp = 3 - turn
+        for i, j, k in self.tables.captures[c]:
+            if cells[i] == opp and cells[j] == opp and cells[k] == turn:
+                return 3
+        return 0
+
+    def middlePieces(self, turn, c):
+        """
+        :return: the value mid_control_pieces gives c
+        """
+        cells = self.board.cells
+        if cells[c] != 0:
+            return 0
+        t = self.tables
+        value = 0
+        for i in t.neighbours[c]:
+            if cells[i] == turn:
+                if t.corner[i]:
+                    return 3
+                if t.middle[i] and t.middle[c]:
+                    value = 6
+        return value
+
+    def updateMomentum(self, turn, p):
+        """
+        Work out the momentum points of one stone and axis again, and what a stone on each cell they read would add
+        :param p: 4 * stone + axis
+        :return: the cells read
+        """
+        cells = self.board.cells
+        deps = self.tables.momentum[p]
+        contributions = self.contributions[turn]
+        terms = self.terms[turn]
+        delta = self.delta[turn]
+        old = contributions[p]
+        new = momentum(cells, turn, deps)
+        contributions[p] = new
+        self.base[turn] += new - old
+        stone = cells[deps[0]] == turn
+        read = self.tables.momentumCells[p]
+        for j in range(len(read)):
+            y = read[j]
+            term = 0
+            # With no stone of the player on the first cell, only a stone there gives points
+            if cells[y] == 0 and (stone or j == 0):
+                cells[y] = turn
+                term = momentum(cells, turn, deps) - new
+                cells[y] = 0
+            delta[y] += term - terms[6 * p + j]
+            terms[6 * p + j] = term
+        return read
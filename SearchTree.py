@@ -0,0 +1,238 @@
+from array import array
+
+
+class SearchTree:
+    """
+    A Monte Carlo search tree kept in flat arrays instead of node objects. Node n is described by visits[n],
+    scores[n], raveVisits[n], raveScores[n], prior[n], parent[n], firstChild[n], childCount[n], openCount[n], move[n]
+    and player[n]. The children of a node are stored next to each other, from firstChild to firstChild + childCount.
+    Only the first openCount of them are open to selection, the rest are held back until the node is visited more often
+    (progressive widening).
+
+    No boards are stored. The board of a node is made by playing the moves on the path from the root.
+
+    Nodes of the same position reached by different move orders can share one block of children (see share). The tree
+    is then a DAG, and parent[n] is only the node that added the block of n.
+
+    :param capacity: the number of nodes there is room for at first. The arrays grow when it runs out
+    :param limit: the number of nodes the arrays do not grow past by doubling, or None
+    """
+
+    def __init__(self, capacity=4096, limit=None):
+        self.capacity = 0
+        self.limit = limit
+        # The number of visits and the win score of every node
+        self.visits = array('i')
+        self.scores = array('d')
+        # The all-moves-as-first visits and win score: the playouts through the parent in which the player of the node
+        # played its move first, anywhere after the parent (RAVE)
+        self.raveVisits = array('i')
+        self.raveScores = array('d')
+        # The prior probability of the move among its siblings, from the heuristic map of the parent (PUCT)
+        self.prior = array('d')
+        # The parent of every node, -1 for the root
+        self.parent = array('i')
+        # The first child and the number of children of every node
+        self.firstChild = array('i')
+        self.childCount = array('i')
+        # The number of children open to selection
+        self.openCount = array('i')
+        # The flat index of the move that leads to every node, -1 for the root
+        self.move = array('i')
+        # The player who made that move
+        self.player = array('b')
+        # The number of nodes in use
+        self.size = 0
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        """
+        Make room for at least capacity nodes
+        :param capacity: the number of nodes
+        """
+        if capacity <= self.capacity:
+            return
+        needed = capacity
+        capacity = max(capacity, 2 * self.capacity)
+        if self.limit is not None:
+            capacity = max(needed, min(capacity, self.limit))
+        extra = capacity - self.capacity
+        for a in (self.visits, self.raveVisits, self.parent, self.firstChild, self.childCount, self.openCount,
+                  self.move):
+            a.extend(array('i', bytes(4 * extra)))
+        self.scores.extend(array('d', bytes(8 * extra)))
+        self.raveScores.extend(array('d', bytes(8 * extra)))
+        self.prior.extend(array('d', bytes(8 * extra)))
+        self.player.extend(array('b', bytes(extra)))
+        self.capacity = capacity
+
+    def clear(self):
+        """
+        Remove every node. The memory is kept for the next search
+        """
+        self.size = 0
+
+    def addRoot(self, player):
+        """
+        Remove every node and add a root
+        :param player: the player who made the last move before the root position
+        :return: the root node, 0
+        """
+        self.clear()
+        self.addChildren(-1, [-1], player)
+        return 0
+
+    def addChildren(self, node, moves, player, opened=None, priors=None):
+        """
+        Add a child for each move to a node without children
+        :param node: the parent node, -1 for the root
+        :param moves: the flat indexes of the moves
+        :param player: the player who makes the moves
+        :param opened: the number of children open to selection, all of them if not given
+        :param priors: the prior probability of each move, the same for all of them if not given
+        :return: the first child
+        """
+        first = self.size
+        count = len(moves)
+        self.grow(first + count)
+        for i in range(count):
+            n = first + i
+            self.visits[n] = 0
+            self.scores[n] = 0.0
+            self.raveVisits[n] = 0
+            self.raveScores[n] = 0.0
+            self.prior[n] = priors[i] if priors is not None else 1.0 / count
+            self.parent[n] = node
+            self.firstChild[n] = -1
+            self.childCount[n] = 0
+            self.openCount[n] = 0
+            self.move[n] = moves[i]
+            self.player[n] = player
+        if node >= 0:
+            self.firstChild[node] = first
+            self.childCount[node] = count
+            self.openCount[node] = count if opened is None else min(opened, count)
+        self.size = first + count
+        return first
+
+    def share(self, node, other):
+        """
+        Give a node without children the children of another node of the same position. Their statistics are then
+        updated through either node
+        :param node: the node without children
+        :param other: the node whose children are shared
+        """
+        self.firstChild[node] = self.firstChild[other]
+        self.childCount[node] = self.childCount[other]
+        self.openCount[node] = self.openCount[other]
+
+    def keep(self, node, threshold=None):
+        """
+        Remove every node that is not in the subtree under node, which becomes the root. The kept nodes are moved to the
+        front of the arrays with their statistics
+        :param node: the new root
+        :param threshold: if given, the children of every node below the root visited at most this many times are
+        removed too, and the node becomes a leaf again
+        :return: the number of nodes kept
+        """
+        # order[k] is the node that moves to k. Every child block stays together, in breadth first order
+        order = [node]
+        # The new first child of every block moved so far, so a block shared by several nodes is only moved once
+        blocks = {}
+        parent = [-1]
+        firstChild = []
+        childCount = []
+        openCount = []
+        k = 0
+        while k < len(order):
+            n = order[k]
+            count = self.childCount[n]
+            if count > 0 and (k == 0 or threshold is None or self.visits[n] > threshold):
+                first = self.firstChild[n]
+                if first in blocks:
+                    firstChild.append(blocks[first])
+                else:
+                    blocks[first] = len(order)
+                    firstChild.append(len(order))
+                    order.extend(range(first, first + count))
+                    parent.extend([k] * count)
+                childCount.append(count)
+                openCount.append(self.openCount[n])
+            else:
+                firstChild.append(-1)
+                childCount.append(0)
+                openCount.append(0)
+            k += 1
+
+        size = len(order)
+        for a in (self.visits, self.scores, self.raveVisits, self.raveScores, self.prior, self.move, self.player):
+            a[0:size] = array(a.typecode, [a[n] for n in order])
+        self.parent[0:size] = array('i', parent)
+        self.firstChild[0:size] = array('i', firstChild)
+        self.childCount[0:size] = array('i', childCount)
+        self.openCount[0:size] = array('i', openCount)
+        self.size = size
+        return size
+
+    def count(self, node, threshold):
+        """
+        :param node: the root
+        :param threshold: the visits at most which a node below the root loses its children
+        :return: the number of nodes keep(node, threshold) would keep
+        """
+        total = 1
+        stack = [node]
+        # The first child of every block counted, a shared block is only counted once
+        blocks = set()
+        while len(stack) > 0:
+            n = stack.pop()
+            count = self.childCount[n]
+            if count > 0 and (n == node or self.visits[n] > threshold) and self.firstChild[n] not in blocks:
+                blocks.add(self.firstChild[n])
+                total += count
+                first = self.firstChild[n]
+                stack.extend(range(first, first + count))
+        return total
+
+    def prune(self, node, target):
+        """
+        Remove the subtrees of the least visited nodes until at most target nodes are left, or only node and its
+        children. The nodes at the edge keep their statistics and are expanded again when they are selected
+        :param node: the root, which becomes node 0
+        :param target: the number of nodes to get down to
+        :return: the number of nodes removed
+        """
+        size = self.size
+        # The smallest threshold that is enough, out of the visits of the nodes with children
+        thresholds = sorted(set(self.visits[n] for n in range(size) if self.childCount[n] > 0 and n != node))
+        if len(thresholds) == 0:
+            return 0
+        low = 0
+        high = len(thresholds) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if self.count(node, thresholds[middle]) <= target:
+                high = middle
+            else:
+                low = middle + 1
+        return size - self.keep(node, thresholds[low])
+
+    def path(self, node):
+        """
+        :param node: a node
+        :return: the nodes from the first move after the root down to node
+        """
+        nodes = []
+        while self.parent[node] >= 0:
+            nodes.append(node)
+            node = self.parent[node]
+        nodes.reverse()
+        return nodes
+
+    def memory(self):
+        """
+        :return: the number of bytes held by the arrays
+        """
+        return sum(a.itemsize * len(a) for a in (self.visits, self.scores, self.raveVisits, self.raveScores, self.prior,
+                                                  self.parent, self.firstChild, self.childCount, self.openCount,
+                                                  self.move, self.player))
@@ -0,0 +1,196 @@
+import sys
+from array import array
+
+# Bound types of a stored score
+EXACT = 0
+LOWER = 1  # the real score is at least the stored score
+UPPER = 2  # the real score is at most the stored score
+
+# Bytes used by one entry: key, score, depth, bound type and best move
+ENTRY_BYTES = 8 + 8 + 1 + 1 + 4
+
+
+class TranspositionTable:
+    """
+    A fixed size transposition table for alpha beta search, keyed by Zobrist position keys.
+
+    Every bucket has two entries. The first one is depth-preferred, it is only replaced by a search that is at least as
+    deep. The second one is always replaced. All entries live in preallocated arrays, so the table never grows past its
+    memory budget.
+
+    :param megabytes: the memory budget of the table
+    """
+
+    def __init__(self, megabytes=16):
+        buckets = 1
+        while buckets * 2 * 2 * ENTRY_BYTES <= megabytes * 1024 * 1024:
+            buckets *= 2
+        self.mask = buckets - 1
+        entries = buckets * 2
+        self.keys = array('Q', bytes(8 * entries))
+        self.scores = array('d', bytes(8 * entries))
+        self.depths = array('b', [-1]) * entries
+        self.flags = array('b', bytes(entries))
+        self.moves = array('i', [-1]) * entries
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def probe(self, key):
+        """
+        Look up a position
+        :param key: the Zobrist key of the position
+        :return: (depth, score, bound type, best move) of the stored entry, or None if the position is not stored
+        """
+        slot = (key & self.mask) * 2
+        for i in (slot, slot + 1):
+            if self.depths[i] >= 0 and self.keys[i] == key:
+                self.hits += 1
+                return self.depths[i], _decode(self.scores[i]), self.flags[i], self.moves[i]
+        self.misses += 1
+        if self.depths[slot] >= 0 or self.depths[slot + 1] >= 0:
+            # The bucket holds other positions that share the same index
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, score, flag, move=-1):
+        """
+        Store the result of searching a position
+        :param key: the Zobrist key of the position
+        :param depth: how many more plies were searched below the position
+        :param score: the score of the search
+        :param flag: EXACT, LOWER or UPPER
+        :param move: the flat index of the best move found, or -1
+        """
+        slot = (key & self.mask) * 2
+        if self.depths[slot] < 0 or self.keys[slot] == key or depth >= self.depths[slot]:
+            i = slot
+        else:
+            i = slot + 1
+        self.keys[i] = key
+        self.depths[i] = depth
+        self.scores[i] = _encode(score)
+        self.flags[i] = flag
+        self.moves[i] = move
+        self.stores += 1
+
+    def clear(self):
+        """
+        Forget every stored position and reset the counters
+        """
+        entries = len(self.keys)
+        self.depths = array('b', [-1]) * entries
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def stats(self):
+        """
+        :return: a dictionary with the hit, miss, collision and store counters and the hit rate
+        """
+        probes = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'collisions': self.collisions,
+            'stores': self.stores,
+            'hitRate': self.hits / probes if probes > 0 else 0.0,
+        }
+
+
+class NodeTable:
+    """
+    A fixed size table from Zobrist position keys to the MCTS nodes of those positions, so a position reached by another
+    move order can share the children of the node already there (a DAG instead of a tree).
+
+    There is one entry per bucket, and a new position always replaces the old one. The entries live in preallocated
+    arrays, so the table never grows past its number of entries.
+
+    :param entries: the most positions the table holds, rounded down to a power of 2
+    """
+
+    def __init__(self, entries=1 << 16):
+        buckets = 1
+        while buckets * 2 <= entries:
+            buckets *= 2
+        self.mask = buckets - 1
+        self.keys = array('Q', bytes(8 * buckets))
+        self.nodes = array('i', [-1]) * buckets
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def probe(self, key):
+        """
+        Look up a position
+        :param key: the Zobrist key of the position
+        :return: the node stored for the position, or -1 if it is not stored
+        """
+        i = key & self.mask
+        if self.nodes[i] >= 0 and self.keys[i] == key:
+            self.hits += 1
+            return self.nodes[i]
+        self.misses += 1
+        if self.nodes[i] >= 0:
+            # The bucket holds another position that shares the same index
+            self.collisions += 1
+        return -1
+
+    def store(self, key, node):
+        """
+        Store the node of a position
+        :param key: the Zobrist key of the position
+        :param node: the node
+        """
+        i = key & self.mask
+        self.keys[i] = key
+        self.nodes[i] = node
+        self.stores += 1
+
+    def clear(self):
+        """
+        Forget every stored position. The counters are kept, call reset for that
+        """
+        self.nodes = array('i', [-1]) * len(self.nodes)
+
+    def reset(self):
+        """
+        Set the hit, miss, collision and store counters back to 0
+        """
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def stats(self):
+        """
+        :return: a dictionary with the hit, miss, collision and store counters and the hit rate
+        """
+        probes = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'collisions': self.collisions,
+            'stores': self.stores,
+            'hitRate': self.hits / probes if probes > 0 else 0.0,
+        }
+
+
+def _encode(score):
+    # The search uses sys.maxsize for wins and losses, which a float can not hold exactly
+    if score >= sys.maxsize:
+        return float('inf')
+    if score <= -sys.maxsize:
+        return float('-inf')
+    return score
+
+
+def _decode(score):
+    if score == float('inf'):
+        return sys.maxsize
+    if score == float('-inf'):
+        return -sys.maxsize
+    return score
@@ -0,0 +1,142 @@
+import random
+
+# Zobrist hashing of Pente positions. A position key is the XOR of one random key per stone, one key per player for
+# that player's capture count, and a key for player 2 being the one to move. The keys are made from a fixed seed, so
+# every process (and every run) uses the same keys.
+
+SEED = 520
+MAX_CAPTURES = 20
+
+# Per board size key tables, built the first time a size is used
+_keys = {}
+
+
+class Keys:
+    """
+    The random keys for one board size
+
+    :param cells: cells[colour][index] is the key for a stone of colour (1 or 2) on the flat index. cells[0] is all 0s
+    :param captures: captures[player - 1][count] is the key for player having captured count pieces. A count of 0 has
+    a key of 0, so an empty board with no captures and player 1 to move hashes to 0
+    :param side: the key for player 2 being the one to move
+    """
+    __slots__ = ('cells', 'captures', 'side')
+
+    def __init__(self, size):
+        rng = random.Random(SEED * 1000 + size)
+        self.cells = [[0] * (size * size)]
+        for colour in (1, 2):
+            self.cells.append([rng.getrandbits(64) for _ in range(size * size)])
+        self.captures = []
+        for player in (1, 2):
+            self.captures.append([0] + [rng.getrandbits(64) for _ in range(MAX_CAPTURES)])
+        self.side = rng.getrandbits(64)
+
+
+def keys(size):
+    """
+    :param size: the board size
+    :return: the Keys for that board size
+    """
+    if size not in _keys:
+        _keys[size] = Keys(size)
+    return _keys[size]
+
+
+def stone_key(size, cells):
+    """
+    Work out the stone part of a position key from scratch
+    :param size: the board size
+    :param cells: the row-major cells of the board
+    :return: the XOR of the keys of all stones on the board
+    """
+    table = keys(size).cells
+    key = 0
+    for index, cell in enumerate(cells):
+        if cell:
+            key ^= table[cell][index]
+    return key
+
+
+def position_key(board, captures, turn):
+    """
+    The key of a position, using the stone key that make_move and unmake_move keep up to date on a FlatBoard
+    :param board: a FlatBoard
+    :param captures: a 2-element list of captured pieces. 1st element is player 1, 2nd is player 2
+    :param turn: the player to move, either 1 or 2
+    :return: the position key
+    """
+    table = keys(board.size)
+    key = board.key ^ table.captures[0][captures[0]] ^ table.captures[1][captures[1]]
+    if turn == 2:
+        key ^= table.side
+    return key
+
+
+def hash_position(board, captures, turn):
+    """
+    The key of a position worked out from scratch, without trusting the FlatBoard's stone key
+    :param board: a FlatBoard
+    :param captures: a 2-element list of captured pieces. 1st element is player 1, 2nd is player 2
+    :param turn: the player to move, either 1 or 2
+    :return: the position key
+    """
+    table = keys(board.size)
+    key = stone_key(board.size, board.cells) ^ table.captures[0][captures[0]] ^ table.captures[1][captures[1]]
+    if turn == 2:
+        key ^= table.side
+    return key
+
+
+def self_check(games=200, seed=None):
+    """
+    Play random games with make_move, update_board and unmake_move, and check after every move that the incrementally
+    updated key matches a key worked out from scratch. Raises an AssertionError on the first mismatch.
+    :param games: the number of random games to play
+    :param seed: the seed for the random games
+    :return: the number of positions checked
+    """
+    import pente
+
+    rng = random.Random(seed)
+    checked = 0
+    for game in range(games):
+        size = rng.choice([7, 9, 11, 13, 19])
+        board = pente.FlatBoard(size)
+        captures = [0, 0]
+        turn = 1
+        records = []
+        keys_seen = [position_key(board, captures, turn)]
+        while True:
+            empty = [i for i, cell in enumerate(board.cells) if cell == 0]
+            if len(empty) == 0 or rng.random() < 0.01:
+                break
+            index = rng.choice(empty)
+
+            # update_board has to give the same key as make_move
+            copied, copied_captures, win = pente.update_board(board, captures, turn, index // size, index % size)
+            record = pente.make_move(board, captures, turn, index // size, index % size)
+            records.append(record)
+            turn = 3 - turn
+            key = position_key(board, captures, turn)
+            assert key == hash_position(board, captures, turn), "make_move key mismatch"
+            assert key == position_key(copied, copied_captures, turn), "update_board key mismatch"
+            keys_seen.append(key)
+            checked += 1
+            if record.win != 0:
+                break
+
+        # Taking the moves back has to give back every earlier key
+        keys_seen.pop()
+        while len(records) > 0:
+            pente.unmake_move(board, captures, records.pop())
+            turn = 3 - turn
+            key = position_key(board, captures, turn)
+            assert key == hash_position(board, captures, turn), "unmake_move key mismatch"
+            assert key == keys_seen.pop(), "unmake_move did not restore the key"
+            checked += 1
+    return checked
+
+
+if __name__ == '__main__':
+    print("Checked", self_check(), "positions")
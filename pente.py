@@ -1,4 +1,5 @@
 import copy
+import Zobrist
 
 
 def make_board(size):
@@ -16,10 +17,149 @@ def print_board(board):
     for i in board:
         print(*i, sep=' ')
 
+
+class FlatBoard:
+    """
+    A compact size by size Pente board. The cells are kept row-major in a single bytearray, so cell (row, col) is
+    cells[row * size + col]. Indexing a FlatBoard by row gives a writable view of that row, which means board[row][col]
+    and len(board) behave the same as for the list of lists boards made by make_board.
+
+    A FlatBoard also keeps the Zobrist key of its stones up to date through make_move and unmake_move. Stones written
+    through the row views do not update it.
+
+    :param size: the number of rows (and columns) of the board
+    :param cells: an optional bytearray of size * size cells to wrap. It is not copied
+    :param key: the Zobrist key of the stones in cells, worked out from scratch if not given
+    """
+    __slots__ = ('size', 'cells', 'key')
+
+    def __init__(self, size, cells=None, key=None):
+        self.size = size
+        if cells is None:
+            self.cells = bytearray(size * size)
+            self.key = 0
+        else:
+            self.cells = cells
+            self.key = Zobrist.stone_key(size, cells) if key is None else key
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build a FlatBoard from a list of lists board
+        :param rows: a list of lists board
+        :return: a new FlatBoard with the same stones
+        """
+        cells = bytearray()
+        for row in rows:
+            cells.extend(row)
+        return cls(len(rows), cells)
+
+    def rows(self):
+        """
+        The list of lists view of the board, for code (like the GUI) that wants plain lists
+        :return: a new list of lists with the same stones
+        """
+        size = self.size
+        return [list(self.cells[i:i + size]) for i in range(0, size * size, size)]
+
+    def copy(self):
+        return FlatBoard(self.size, self.cells[:], self.key)
+
+    def __deepcopy__(self, memo):
+        board = self.copy()
+        memo[id(self)] = board
+        return board
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, row):
+        # Negative rows wrap around just like they do for a list of lists
+        if row < 0:
+            row += self.size
+        if not 0 <= row < self.size:
+            raise IndexError('board row out of range')
+        return memoryview(self.cells)[row * self.size:(row + 1) * self.size]
+
+    def __iter__(self):
+        for row in range(self.size):
+            yield self[row]
+
+    def __eq__(self, other):
+        if isinstance(other, FlatBoard):
+            return self.size == other.size and self.cells == other.cells
+        return NotImplemented
+
+
+def to_flat(board):
+    """
+    :param board: a FlatBoard or a list of lists board
+    :return: the board itself if it is already a FlatBoard, otherwise a FlatBoard copy of it
+    """
+    if isinstance(board, FlatBoard):
+        return board
+    return FlatBoard.from_rows(board)
+
+
+# Per board size lookup tables of flat cell indices, built the first time a size is used
+_tables = {}
+
+
+def lines(size):
+    """
+    Lookup tables for finding fives and captures on a FlatBoard of the given size.
+
+    fives[index] holds, for each of the four axes, the cells up to 4 steps forward and up to 4 steps backward of index.
+    captures[index] holds the (1st, 2nd, 3rd) cells of every direction a capture can be checked in, in the same order
+    update_board checks them. Negative rows and columns wrap around exactly like list indexing does in update_board.
+
+    :param size: the board size
+    :return: fives, captures
+    """
+    if size in _tables:
+        return _tables[size]
+
+    fives = []
+    captures = []
+    for row in range(size):
+        for col in range(size):
+            axes = []
+            for dir in [(1, 0), (0, 1), (1, 1), (1, -1)]:
+                forward = []
+                for i in range(1, 5):
+                    r, c = row + i * dir[0], col + i * dir[1]
+                    if not (0 <= r < size and 0 <= c < size):
+                        break
+                    forward.append(r * size + c)
+                backward = []
+                for i in range(1, 5):
+                    r, c = row - i * dir[0], col - i * dir[1]
+                    if not (0 <= r < size and 0 <= c < size):
+                        break
+                    backward.append(r * size + c)
+                axes.append((forward, backward))
+            fives.append(axes)
+
+            dirs = []
+            for dir in [(0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (-1, -1), (1, -1), (-1, 1)]:
+                cells = []
+                for i in range(1, 4):
+                    r, c = row + i * dir[0], col + i * dir[1]
+                    if not (-size <= r < size and -size <= c < size):
+                        break
+                    cells.append((r % size) * size + c % size)
+                if len(cells) == 3:
+                    dirs.append(tuple(cells))
+            captures.append(dirs)
+
+    _tables[size] = fives, captures
+    return fives, captures
+
+
 def update_board(curr_board, captures, turn, row, col):
     """
     This function takes a board state and returns the new board state. It accounts for captures.
-    :param curr_board: a Board class object (defined above) for the current board
+    :param curr_board: the current board, either a FlatBoard or a list of lists board. The result has the same type
     :param captures: a 2-element list for keeping track of captured pieces. 1st element is player 1, 2nd is player 2
     :param turn: either 1 or 2, depending on if the 1st or 2nd player is placing a piece
     :param row: the row number for the piece being placed
@@ -28,8 +168,12 @@ def update_board(curr_board, captures, turn, row, col):
     player 1 won, and 2 if player 2 won.
     """
 
-    board = copy.deepcopy(curr_board)
     captures = captures.copy()
+    if isinstance(curr_board, FlatBoard):
+        board = curr_board.copy()
+        return board, captures, make_move(board, captures, turn, row, col).win
+
+    board = copy.deepcopy(curr_board)
 
     if board[row][col] == 0:
         # Change piece to players number
@@ -88,6 +232,144 @@ def update_board(curr_board, captures, turn, row, col):
     return board, captures, 0
 
 
+class MoveRecord:
+    """
+    What make_move changed, so that unmake_move can take the move back.
+
+    :param index: the flat index of the placed stone
+    :param turn: the player who placed it
+    :param removed: the flat indices of the opponent stones it captured
+    :param captures: the capture counts before the move
+    :param status: the game status before the move
+    :param win: the game status after the move, 0 if the game is not over, otherwise the winning player
+    """
+    __slots__ = ('index', 'turn', 'removed', 'captures', 'status', 'win')
+
+    def __init__(self, index, turn, captures, status):
+        self.index = index
+        self.turn = turn
+        self.removed = []
+        self.captures = captures
+        self.status = status
+        self.win = 0
+
+
+def make_move(board, captures, turn, row, col, status=0):
+    """
+    Place a stone on a FlatBoard in place. Follows the same rules as update_board, but nothing is copied.
+    :param board: a FlatBoard, changed in place
+    :param captures: a 2-element list for keeping track of captured pieces, changed in place
+    :param turn: either 1 or 2, depending on if the 1st or 2nd player is placing a piece
+    :param row: the row number for the piece being placed
+    :param col: the column number for the piece being placed
+    :param status: the game status before the move, kept so unmake_move can give it back
+    :return: a MoveRecord. Its win is 0 if the game is not over, 1 if player 1 won, and 2 if player 2 won.
+    """
+    size = board.size
+    cells = board.cells
+    index = row * size + col
+    if not (0 <= row < size and 0 <= col < size) or cells[index] != 0:
+        raise Exception("Invalid Move")
+
+    fives, capture_lines = lines(size)
+    stone_keys = Zobrist.keys(size).cells
+    record = MoveRecord(index, turn, (captures[0], captures[1]), status)
+    cells[index] = turn
+    board.key ^= stone_keys[turn][index]
+
+    # Check if the player has made 5 in a row
+    for forward, backward in fives[index]:
+        count = 0
+        for i in forward:
+            if cells[i] != turn:
+                break
+            count += 1
+        for i in backward:
+            if cells[i] != turn:
+                break
+            count += 1
+        if count >= 4:
+            record.win = turn
+            return record
+
+    # Check if any pieces were captured. It also ends the game if 10 pieces have been captured
+    opp = 3 - turn
+    for first, second, third in capture_lines[index]:
+        if cells[first] == opp and cells[second] == opp and cells[third] == turn:
+            cells[first] = 0
+            cells[second] = 0
+            board.key ^= stone_keys[opp][first] ^ stone_keys[opp][second]
+            record.removed.append(first)
+            record.removed.append(second)
+            captures[turn - 1] += 2
+            if captures[turn - 1] >= 10:
+                record.win = turn
+                return record
+    return record
+
+
+def unmake_move(board, captures, record):
+    """
+    Take back a move made by make_move. Moves have to be taken back in the reverse order they were made.
+    :param board: the FlatBoard the move was made on, changed in place
+    :param captures: the captures list the move was made with, changed in place
+    :param record: the MoveRecord returned by make_move
+    :return: the game status before the move
+    """
+    cells = board.cells
+    stone_keys = Zobrist.keys(board.size).cells
+    cells[record.index] = 0
+    board.key ^= stone_keys[record.turn][record.index]
+    opp = 3 - record.turn
+    for i in record.removed:
+        cells[i] = opp
+        board.key ^= stone_keys[opp][i]
+    captures[0], captures[1] = record.captures
+    return record.status
+
+
+def line_length(board, turn, index):
+    """
+    The longest line of turn's stones that a stone of turn placed on index would join, not counting that stone.
+    A result of 4 or more means placing there makes 5 in a row.
+    :param board: a FlatBoard
+    :param turn: either 1 or 2, the player whose stones are counted
+    :param index: the flat index of an empty cell
+    :return: the number of turn's stones in the longest line through index
+    """
+    cells = board.cells
+    longest = 0
+    for forward, backward in lines(board.size)[0][index]:
+        count = 0
+        for i in forward:
+            if cells[i] != turn:
+                break
+            count += 1
+        for i in backward:
+            if cells[i] != turn:
+                break
+            count += 1
+        if count > longest:
+            longest = count
+    return longest
+
+
+def count_captures(board, turn, index):
+    """
+    :param board: a FlatBoard
+    :param turn: either 1 or 2, the player placing a stone
+    :param index: the flat index of an empty cell
+    :return: the number of pairs turn would capture by placing a stone on index
+    """
+    cells = board.cells
+    opp = 3 - turn
+    count = 0
+    for first, second, third in lines(board.size)[1][index]:
+        if cells[first] == opp and cells[second] == opp and cells[third] == turn:
+            count += 1
+    return count
+
+
 # Main function for testing. Current code is just to check if captures work.
 if __name__ == '__main__':
     game = make_board(7)